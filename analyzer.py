@@ -1,158 +1,282 @@
-from datetime import datetime
+from stock_table import as_stock_table
+from screens import ScreenEngine
+from market_structure import CLUSTER_CORR, CORRELATION_DAYS, HIGH_PAIR_CORR
+
+# Medium-risk portfolio rules; backtest.py replays exactly these
+RISK_BAND = (3, 7)
+MAX_PICKS = 12
+STOP_LOSS = 0.05
+TARGETS = (0.08, 0.15)
+
+
+def risk_scores(table):
+    """Vectorized medium-risk score (5 = neutral) for every row of the stock table"""
+    beta = table["beta"]
+    pe = table["pe_ratio"]
+    dy = table["dividend_yield"]
+    vol = table["volatility"]
+
+    risk = 5
+    risk = risk - (beta < 0.8).astype(int) + (beta > 1.3).astype(int)
+    risk = risk - ((pe > 15) & (pe < 30)).astype(int) + (pe > 40).astype(int)
+    risk = risk - (dy > 1.5).astype(int)
+    risk = risk - (vol < 2).astype(int) + (vol > 4).astype(int)
+    return risk
+
+
+def market_mood(indices):
+    """Average NIFTY/SENSEX change and the sentiment line for it"""
+    avg_change = (indices["nifty"]["change_pct"] + indices["sensex"]["change_pct"]) / 2
+    if avg_change > 1:
+        mood = "STRONG BULLISH - Risk-on, buyers dominant"
+    elif avg_change > 0:
+        mood = "MILD BULLISH - Positive bias, buying on dips"
+    elif avg_change > -1:
+        mood = "MILD BEARISH - Cautious, range-bound"
+    else:
+        mood = "STRONG BEARISH - Risk-off, selling pressure"
+    return avg_change, mood
+
+
+def trading_strategy(indices):
+    avg = (indices["nifty"]["change_pct"] + indices["sensex"]["change_pct"]) / 2
+    if avg >= 0.5:
+        return "BIAS: BULLISH\n• Prefer buying quality names on dips\n• Focus on top gaining sectors\n• Use 2-3% position size per trade\n• Tight stop losses below support"
+    elif avg >= -0.5:
+        return "BIAS: NEUTRAL/RANGE-BOUND\n• Trade within key support/resistance\n• Avoid large directional bets\n• Focus on volatile individual stocks\n• Use 1-2% per trade, take profits early"
+    else:
+        return "BIAS: BEARISH\n• Defensive approach, protect capital\n• Avoid leveraged/speculative trades\n• Focus on large-cap dividend payers\n• Use tight stops, smaller position sizes"
+
+
+def medium_risk_candidates(stocks, risk_band=RISK_BAND):
+    """In-band stocks with their risk_score, best first (risk, then 30D return)"""
+    risk = risk_scores(stocks)
+    in_band = (risk >= risk_band[0]) & (risk <= risk_band[1])
+    filtered = stocks.assign(risk_score=risk)[in_band]
+    return filtered.sort_values(
+        ["risk_score", "month_return"], ascending=[True, False], kind="stable"
+    )
+
+
+def with_exit_levels(picks, stop_loss=STOP_LOSS, targets=TARGETS):
+    return picks.assign(
+        sl=(picks["current_price"] * (1 - stop_loss)).round(2),
+        t1=(picks["current_price"] * (1 + targets[0])).round(2),
+        t2=(picks["current_price"] * (1 + targets[1])).round(2),
+    )
+
+
+def table_section(title, columns, rows, align=None):
+    """Report section rendered as a table (see report_generator)"""
+    return {"title": title, "columns": columns, "rows": rows, "align": align}
+
+
+def text_section(title, text):
+    return {"title": title, "text": text}
+
+
+def structure_sections(structure):
+    """Sector rotation and co-moving clusters from a MarketStructure"""
+    sections = [table_section(
+        f"Sector rotation vs the universe (as of {structure.as_of})",
+        ["Sector", "Stocks", "1W %", "1M %", "RS 1M", "RS 1W", "Phase"],
+        [
+            [r["sector"], r["stocks"], f"{r['week']:+.2f}", f"{r['month']:+.2f}",
+             f"{r['rs_month']:+.2f}", f"{r['rs_week']:+.2f}", r["phase"]]
+            for r in structure.rotation
+        ],
+        "LRRRRRL",
+    )]
+    clusters = structure.cluster_rows()
+    if clusters:
+        sections.append(table_section(
+            f"Co-moving clusters (correlation >= {CLUSTER_CORR:.2f}, {CORRELATION_DAYS} days)",
+            ["#", "Lead", "Size", "Avg corr", "Sectors", "Members"],
+            [
+                [i, c["lead"], c["size"], f"{c['avg_corr']:.2f}", c["sectors"],
+                 ", ".join(c["members"][1:7]) + (f" +{c['size'] - 7}" if c["size"] > 7 else "")]
+                for i, c in enumerate(clusters, 1)
+            ],
+            "RLRRLL",
+        ))
+    else:
+        sections.append(text_section(
+            "Co-moving clusters", f"No group of names correlated at {CLUSTER_CORR:.2f} or more"
+        ))
+    return sections
+
+
+def diversification_section(structure, symbols):
+    """Are the picks different trades? None when too few of them have returns"""
+    check = structure.diversification(symbols)
+    if check is None:
+        return None
+    k = check["picks"]
+    if check["avg_corr"] > 0.6 or check["effective_bets"] < k / 3:
+        verdict = "CONCENTRATED - the picks largely move as one trade"
+    elif check["avg_corr"] > 0.4 or check["effective_bets"] < k / 2:
+        verdict = "MODERATE - some picks overlap, size positions accordingly"
+    else:
+        verdict = "DIVERSIFIED - the picks move largely independently"
+    a, b, corr = check["max_pair"]
+    return table_section(
+        f"Diversification check ({k} picks, {CORRELATION_DAYS}-day returns)",
+        ["Check", "Value"],
+        [
+            ["Average pairwise correlation", f"{check['avg_corr']:.2f}"],
+            ["Most correlated pair", f"{a} / {b} ({corr:.2f})"],
+            [f"Pairs correlated >= {HIGH_PAIR_CORR:.2f}", check["high_pairs"]],
+            ["Effective independent bets", f"{check['effective_bets']:.1f} of {k}"],
+            ["Diversification ratio (equal weight)", f"{check['diversification_ratio']:.2f}"],
+            ["Most picks in one cluster", check["largest_cluster"]],
+            ["Sectors represented", check["sectors"]],
+            ["Verdict", verdict],
+        ],
+        "LL",
+    )
+
 
 class MarketAnalyzer:
-    def analyze_intraday(self, indices, stocks_data, news, sector_perf):
-        lines = []
-        lines.append("=" * 70)
-        lines.append("INTRADAY MARKET ANALYSIS - REAL DATA")
-        lines.append("=" * 70)
-        lines.append(f"Generated: {datetime.now().strftime('%d %B %Y, %H:%M IST')}\n")
+    def __init__(self, risk_band=RISK_BAND, max_picks: int = MAX_PICKS,
+                 stop_loss: float = STOP_LOSS, targets=TARGETS):
+        # portfolio rules; report profiles override them per report
+        self.risk_band = tuple(risk_band)
+        self.max_picks = max_picks
+        self.stop_loss = stop_loss
+        self.targets = tuple(targets)
 
+    def _picks(self, stocks):
+        """(in-band candidates, top picks with exit levels)"""
+        filtered = medium_risk_candidates(stocks, self.risk_band)
+        picks = with_exit_levels(filtered.head(self.max_picks), self.stop_loss, self.targets)
+        return filtered, picks
+
+    def intraday_sections(self, indices, stocks_data, news, sector_perf, screens=None,
+                          structure=None):
+        """
+        The intraday analysis as structured report parts for the PDF:
+        [{"title": part title, "sections": [table / text sections]}]
+        With a MarketStructure, part 2 adds sector rotation and clusters.
+        """
+        stocks = as_stock_table(stocks_data)
+        overview = []
         if indices:
-            n = indices["nifty"]
-            s = indices["sensex"]
-            avg_change = (n["change_pct"] + s["change_pct"]) / 2
-            
-            lines.append(f"NIFTY 50  : {n['current']:>9.2f} ({n['change']:+7.2f}) [{n['change_pct']:+6.2f}%]")
-            lines.append(f"SENSEX    : {s['current']:>9.2f} ({s['change']:+7.2f}) [{s['change_pct']:+6.2f}%]\n")
-            
-            if avg_change > 1:
-                mood = "STRONG BULLISH - Risk-on, buyers dominant"
-            elif avg_change > 0:
-                mood = "MILD BULLISH - Positive bias, buying on dips"
-            elif avg_change > -1:
-                mood = "MILD BEARISH - Cautious, range-bound"
-            else:
-                mood = "STRONG BEARISH - Risk-off, selling pressure"
-            
-            lines.append(f"Market Sentiment: {mood}\n")
+            rows = [
+                [label, f"{i['current']:.2f}", f"{i['change']:+.2f}", f"{i['change_pct']:+.2f}%"]
+                for label, i in (("NIFTY 50", indices["nifty"]), ("SENSEX", indices["sensex"]))
+            ]
+            overview.append(table_section(
+                "Indices", ["Index", "Level", "Change", "Change %"], rows, "LRRR"
+            ))
+            overview.append(text_section(None, f"Market Sentiment: {market_mood(indices)[1]}"))
         else:
-            lines.append("Market indices unavailable - analyzing stocks directly\n")
-
-        if stocks_data:
-            sorted_stocks = sorted(stocks_data, key=lambda x: x["month_return"], reverse=True)
-            
-            lines.append("=" * 70)
-            lines.append("TOP 15 GAINERS (Last 30 Days - REAL DATA)")
-            lines.append("=" * 70)
-            for i, s in enumerate(sorted_stocks[:15], 1):
-                lines.append(
-                    f"{i:2d}. {s['symbol']:>10} Rs{s['current_price']:>8.2f} "
-                    f"({s['month_return']:+6.2f}%) | {s['sector']}"
-                )
-
-            lines.append("\n" + "=" * 70)
-            lines.append("TOP 15 LOSERS (Last 30 Days - REAL DATA)")
-            lines.append("=" * 70)
-            for i, s in enumerate(sorted_stocks[-15:], 1):
-                lines.append(
-                    f"{i:2d}. {s['symbol']:>10} Rs{s['current_price']:>8.2f} "
-                    f"({s['month_return']:+6.2f}%) | {s['sector']}"
-                )
+            overview.append(text_section(None, "Market indices unavailable - analyzing stocks directly"))
+
+        if not stocks.empty:
+            for title, rows in (
+                ("Top 15 gainers (last 30 days)", stocks.nlargest(15, "month_return")),
+                ("Top 15 losers (last 30 days)", stocks.nsmallest(15, "month_return")),
+            ):
+                overview.append(table_section(
+                    title, ["#", "Symbol", "Price (Rs)", "30D %", "Sector"],
+                    [
+                        [i, s.symbol, f"{s.current_price:.2f}", f"{s.month_return:+.2f}", s.sector]
+                        for i, s in enumerate(rows.itertuples(index=False), 1)
+                    ],
+                    "RLRRL",
+                ))
 
+        strategy = []
         if sector_perf:
-            lines.append("\n" + "=" * 70)
-            lines.append("SECTOR PERFORMANCE (Last 30 Days)")
-            lines.append("=" * 70)
-            for sector, ret in list(sector_perf.items())[:15]:
-                emoji = "▲" if ret > 0 else "▼"
-                lines.append(f"{emoji} {sector:25} {ret:+7.2f}%")
+            strategy.append(table_section(
+                "Sector performance (last 30 days)", ["Sector", "Avg 30D %"],
+                [[sector, f"{ret:+.2f}"] for sector, ret in list(sector_perf.items())[:15]],
+                "LR",
+            ))
+        if structure is not None:
+            strategy.extend(structure_sections(structure))
+
+        if screens and not stocks.empty:
+            results = ScreenEngine(stocks).run_all(screens)
+            for screen in screens:
+                rows = results.get(screen["name"])
+                if rows is None or rows.empty:
+                    continue
+                cols = [screen["rank_by"]] + [
+                    c for c in screen.get("show", []) if c != screen["rank_by"]
+                ]
+                strategy.append(table_section(
+                    screen["title"], ["#", "Symbol", "Price (Rs)"] + cols + ["Sector"],
+                    [
+                        [i, r["symbol"], f"{r['current_price']:.2f}"]
+                        + [f"{r[c]:.2f}" for c in cols] + [r["sector"]]
+                        for i, r in enumerate(rows.to_dict("records"), 1)
+                    ],
+                    "RLR" + "R" * len(cols) + "L",
+                ))
 
         if news:
-            lines.append("\n" + "=" * 70)
-            lines.append("LATEST MARKET NEWS")
-            lines.append("=" * 70)
-            for i, headline in enumerate(news[:8], 1):
-                truncated = headline[:65] + "..." if len(headline) > 65 else headline
-                lines.append(f"{i}. {truncated}")
-
-        lines.append("\n" + "=" * 70)
-        lines.append("INTRADAY TRADING STRATEGY")
-        lines.append("=" * 70)
-        
+            strategy.append(text_section(
+                "Latest market news",
+                "\n".join(f"{i}. {h}" for i, h in enumerate(news[:8], 1)),
+            ))
         if indices:
-            avg = (indices["nifty"]["change_pct"] + indices["sensex"]["change_pct"]) / 2
-            if avg >= 0.5:
-                strategy = "BIAS: BULLISH\n• Prefer buying quality names on dips\n• Focus on top gaining sectors\n• Use 2-3% position size per trade\n• Tight stop losses below support"
-            elif avg >= -0.5:
-                strategy = "BIAS: NEUTRAL/RANGE-BOUND\n• Trade within key support/resistance\n• Avoid large directional bets\n• Focus on volatile individual stocks\n• Use 1-2% per trade, take profits early"
-            else:
-                strategy = "BIAS: BEARISH\n• Defensive approach, protect capital\n• Avoid leveraged/speculative trades\n• Focus on large-cap dividend payers\n• Use tight stops, smaller position sizes"
-            lines.append(strategy)
-        
-        return "\n".join(lines)
-
-    def recommend_medium_risk(self, stocks_data):
-        lines = []
-        lines.append("=" * 70)
-        lines.append("MEDIUM-RISK PORTFOLIO - REAL STOCK ANALYSIS")
-        lines.append("=" * 70)
-
-        if not stocks_data:
-            lines.append("No stock data available")
-            return "\n".join(lines)
-
-        filtered = []
-        for s in stocks_data:
-            beta = s["beta"]
-            pe = s["pe_ratio"]
-            dy = s["dividend_yield"]
-            vol = s["volatility"]
-
-            risk = 5
-            if beta < 0.8:
-                risk -= 1
-            elif beta > 1.3:
-                risk += 1
-            if 15 < pe < 30:
-                risk -= 1
-            elif pe > 40:
-                risk += 1
-            if dy > 1.5:
-                risk -= 1
-            if vol < 2:
-                risk -= 1
-            elif vol > 4:
-                risk += 1
-
-            if 3 <= risk <= 7:
-                s_copy = dict(s)
-                s_copy["risk_score"] = risk
-                filtered.append(s_copy)
-
-        if not filtered:
-            lines.append("No medium-risk stocks found")
-            return "\n".join(lines)
-
-        filtered.sort(key=lambda x: (x["risk_score"], -x["month_return"]))
-
-        lines.append(f"\nFound {len(filtered)} medium-risk stocks\n")
-
-        for i, s in enumerate(filtered[:12], 1):
-            cp = s["current_price"]
-            entry = cp
-            sl = round(cp * 0.95, 2)
-            t1 = round(cp * 1.08, 2)
-            t2 = round(cp * 1.15, 2)
-            
-            lines.append("-" * 70)
-            lines.append(f"#{i:2d} {s['symbol']:>10} | {s['name'][:40]}")
-            lines.append("-" * 70)
-            lines.append(f"Sector         : {s['sector']}")
-            lines.append(f"Risk Score     : {s['risk_score']}/10")
-            lines.append(f"Price          : Rs{cp:.2f}")
-            lines.append(f"30D Return     : {s['month_return']:+.2f}%")
-            lines.append(f"PE / Beta      : {s['pe_ratio']:.2f} / {s['beta']:.2f}")
-            lines.append(f"Dividend Yield : {s['dividend_yield']:.2f}%")
-            lines.append(f"52W High/Low   : Rs{s['week52_high']:.2f} / Rs{s['week52_low']:.2f}")
-            lines.append(f"\n  ENTRY      : Rs{entry:.2f}")
-            lines.append(f"  STOPLOSS   : Rs{sl:.2f}  (5% downside)")
-            lines.append(f"  TARGET1    : Rs{t1:.2f}  (8% upside)")
-            lines.append(f"  TARGET2    : Rs{t2:.2f}  (15% upside)\n")
-
-        lines.append("=" * 70)
-        lines.append("DISCLAIMER")
-        lines.append("=" * 70)
-        lines.append("This is for EDUCATIONAL purposes only. NOT investment advice.")
-
-        return "\n".join(lines)
+            strategy.append(text_section("Intraday trading strategy", trading_strategy(indices)))
+
+        return [
+            {"title": "PART 1: MARKET OVERVIEW & INDICES", "sections": overview},
+            {"title": "PART 2: SECTOR ANALYSIS & TRADING STRATEGY", "sections": strategy},
+        ]
+
+    def portfolio_sections(self, stocks_data, structure=None):
+        """
+        Medium-risk picks as structured report parts (see intraday_sections);
+        with a MarketStructure, part 4 checks the picks' diversification.
+        """
+        stocks = as_stock_table(stocks_data)
+        filtered, picks = self._picks(stocks) if not stocks.empty else (stocks, stocks)
+        if filtered.empty:
+            message = "No stock data available" if stocks.empty else "No medium-risk stocks found"
+            return [{
+                "title": "PART 3: MEDIUM-RISK STOCK RECOMMENDATIONS",
+                "sections": [text_section(None, message)],
+            }]
+
+        overview = table_section(
+            f"Found {len(filtered)} medium-risk stocks - top {len(picks)}",
+            ["#", "Symbol", "Name", "Sector", "Risk", "Price (Rs)", "30D %", "PE", "Beta", "Div %"],
+            [
+                [
+                    i, s.symbol, s.name[:28], s.sector, f"{s.risk_score}/10",
+                    f"{s.current_price:.2f}", f"{s.month_return:+.2f}", f"{s.pe_ratio:.1f}",
+                    f"{s.beta:.2f}" if s.beta == s.beta else "N/A", f"{s.dividend_yield:.2f}",
+                ]
+                for i, s in enumerate(picks.itertuples(index=False), 1)
+            ],
+            "RLLLRRRRRR",
+        )
+        levels = table_section(
+            f"Entry levels (stop {self.stop_loss:.0%}, "
+            f"targets {self.targets[0]:.0%} / {self.targets[1]:.0%})",
+            ["#", "Symbol", "Entry", "Stop loss", "Target 1", "Target 2", "52W High", "52W Low"],
+            [
+                [
+                    i, s.symbol, f"{s.current_price:.2f}", f"{s.sl:.2f}", f"{s.t1:.2f}",
+                    f"{s.t2:.2f}", f"{s.week52_high:.2f}", f"{s.week52_low:.2f}",
+                ]
+                for i, s in enumerate(picks.itertuples(index=False), 1)
+            ],
+            "RLRRRRRR",
+        )
+        allocation = [levels]
+        if structure is not None:
+            check = diversification_section(structure, list(picks["symbol"]))
+            if check is not None:
+                allocation.append(check)
+        allocation.append(text_section(
+            "Disclaimer", "This is for EDUCATIONAL purposes only. NOT investment advice."
+        ))
+        return [
+            {"title": "PART 3: MEDIUM-RISK STOCK RECOMMENDATIONS", "sections": [overview]},
+            {"title": "PART 4: PORTFOLIO ALLOCATION & ENTRY LEVELS", "sections": allocation},
+        ]
@@ -0,0 +1,356 @@
+"""
+Vectorized backtest of the medium-risk recommendation rules.
+
+Replays MarketAnalyzer's medium-risk picks over stored daily history.
+For every date the risk score is computed for the whole universe at once
+from point-in-time rolling beta, volatility and return; the top picks in
+the risk band are entered at that close. For every pick, the first day
+the stop loss, target 1 and target 2 are touched is found from sliding
+windows over the low / high matrices (no per-day Python loop). Chunks of
+dates are evaluated in a process pool.
+
+Caveats: PE and dividend yield have no point-in-time history here, so
+today's values (fundamentals cache / synthetic info) are used for every
+date. A bar that touches both the stop and a target counts as a stop,
+since the order within the day is unknown.
+
+    python backtest.py --offline --size 2000 --years 5
+    python backtest.py --sl 4 --t1 6 --t2 12 --horizon 40
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from analyzer import MAX_PICKS, RISK_BAND, STOP_LOSS, TARGETS, risk_scores
+from price_analytics import BENCHMARK, build_price_matrix
+
+# Trading-day equivalents of the collector's windows (60 / 365 calendar days)
+RETURN_WINDOW = 42
+BETA_WINDOW = 250
+BETA_MIN_PERIODS = 60
+
+
+def rolling_beta(returns, market, window: int = BETA_WINDOW,
+                 min_periods: int = BETA_MIN_PERIODS):
+    """T x N rolling beta of `returns` against `market`, on dates where both exist"""
+    mask = returns.notna() & market.notna().to_numpy()[:, None]
+    r = returns.where(mask)
+    m = pd.DataFrame(
+        np.where(mask, market.to_numpy()[:, None], np.nan),
+        index=returns.index, columns=returns.columns,
+    )
+
+    def mean(x):
+        return x.rolling(window, min_periods=min_periods).mean()
+
+    cov = mean(r * m) - mean(r) * mean(m)
+    var = mean(m * m) - mean(m) ** 2
+    return (cov / var).to_numpy()
+
+
+def load_matrices(histories, benchmark: str = BENCHMARK):
+    """Aligned date x symbol close/high/low matrices plus the benchmark closes"""
+    closes = build_price_matrix(histories, "Close")
+    market = closes.pop(benchmark) if benchmark in closes else pd.Series(np.nan, closes.index)
+    highs = build_price_matrix(histories, "High").reindex_like(closes).fillna(closes)
+    lows = build_price_matrix(histories, "Low").reindex_like(closes).fillna(closes)
+    return closes, highs, lows, market
+
+
+def signals(closes, market, infos):
+    """
+    Point-in-time stock-table columns for every (date, symbol), as T x N
+    arrays keyed like the stock table, plus the risk score.
+    """
+    returns = closes.pct_change(fill_method=None)
+    pe = np.array([float(infos.get(s, {}).get("trailingPE") or 0) for s in closes.columns])
+    dy = np.array(
+        [float(infos.get(s, {}).get("dividendYield") or 0) * 100 for s in closes.columns]
+    )
+    table = {
+        "beta": np.round(rolling_beta(returns, market.pct_change(fill_method=None)), 2),
+        "pe_ratio": np.broadcast_to(pe, closes.shape),
+        "dividend_yield": np.broadcast_to(dy, closes.shape),
+        "volatility": np.round(
+            returns.rolling(RETURN_WINDOW, min_periods=20).std().to_numpy() * 100, 2
+        ),
+        "month_return": np.round(
+            (closes / closes.shift(RETURN_WINDOW - 1) - 1).to_numpy() * 100, 2
+        ),
+    }
+    table["risk_score"] = risk_scores(table)
+    return table
+
+
+def select_trades(closes, table, picks: int = MAX_PICKS, risk_band=RISK_BAND,
+                  all_pairs: bool = False):
+    """
+    (date index, symbol index) of every trade: per date, the first `picks`
+    in-band stocks ordered by (risk score, -month return) as in the report,
+    or every in-band pair with `all_pairs`.
+    """
+    risk = table["risk_score"]
+    month_return = table["month_return"]
+    eligible = (
+        ~np.isnan(closes.to_numpy()) & ~np.isnan(month_return)
+        & (risk >= risk_band[0]) & (risk <= risk_band[1])
+    )
+    if all_pairs:
+        return np.nonzero(eligible)
+
+    n = risk.shape[1]
+    # rank by -month_return within each date, then order by risk first
+    mr_rank = np.argsort(
+        np.argsort(np.where(eligible, -month_return, np.inf), axis=1, kind="stable"),
+        axis=1, kind="stable",
+    )
+    key = np.where(eligible, risk * (n + 1) + mr_rank, np.inf)
+    order = np.argsort(key, axis=1, kind="stable")[:, :picks]
+    rows = np.repeat(np.arange(len(key)), order.shape[1])
+    cols = order.ravel()
+    keep = np.isfinite(key[rows, cols])
+    return rows[keep], cols[keep]
+
+
+def _first(hit, horizon: int):
+    """Index of the first True per row, `horizon` when there is none"""
+    return np.where(hit.any(axis=1), hit.argmax(axis=1), horizon)
+
+
+def evaluate_trades(future, rows, cols, stop_loss: float, targets, horizon: int):
+    """
+    First-hit days (0-based, `horizon` = never) of the stop and both targets
+    for trades entered at the close of `rows`, and the return under a
+    'sell at T1' and a 'sell at T2' policy (timeouts exit at the last close).
+    """
+    entry = future["entry"][rows, cols]
+    win_low = future["low"][rows + 1, cols]
+    win_high = future["high"][rows + 1, cols]
+    win_close = future["close"][rows + 1, cols]
+
+    sl_day = _first(win_low <= (entry * (1 - stop_loss))[:, None], horizon)
+    t1_day = _first(win_high >= (entry * (1 + targets[0]))[:, None], horizon)
+    t2_day = _first(win_high >= (entry * (1 + targets[1]))[:, None], horizon)
+
+    seen = ~np.isnan(win_close)
+    last = horizon - 1 - seen[:, ::-1].argmax(axis=1)
+    timeout = win_close[np.arange(len(rows)), last] / entry - 1
+
+    def policy(target_day, target):
+        return np.where(
+            target_day < sl_day, target,
+            np.where(sl_day < horizon, -stop_loss, timeout),
+        )
+
+    return {
+        "entry": entry,
+        "sl_day": sl_day,
+        "t1_day": t1_day,
+        "t2_day": t2_day,
+        "ret_t1": policy(t1_day, targets[0]) * 100,
+        "ret_t2": policy(t2_day, targets[1]) * 100,
+        "days_t2": np.minimum(np.minimum(sl_day, t2_day), horizon) + 1,
+        "open": seen.sum(axis=1) < horizon,
+    }
+
+
+def padded_matrices(closes, highs, lows, horizon: int):
+    """Close / high / low arrays NaN-padded by `horizon` rows past the last date"""
+    pad = np.full((horizon, closes.shape[1]), np.nan)
+    return {
+        name: np.vstack([frame.to_numpy(), pad])
+        for name, frame in (("close", closes), ("high", highs), ("low", lows))
+    }
+
+
+def future_windows(padded, horizon: int):
+    """
+    Entry prices plus (T x N x horizon) views of the next `horizon` bars;
+    [t + 1] is the window after day t. Views only - nothing is copied.
+    """
+    future = {
+        name: sliding_window_view(array, horizon, axis=0) for name, array in padded.items()
+    }
+    future["entry"] = padded["close"][:-horizon]
+    return future
+
+
+_FUTURE = None
+
+
+def _init_worker(padded, horizon: int):
+    # the padded arrays are sent once per worker; views are rebuilt there
+    global _FUTURE
+    _FUTURE = future_windows(padded, horizon)
+
+
+def _evaluate_chunk(args):
+    rows, cols, stop_loss, targets, horizon = args
+    return evaluate_trades(_FUTURE, rows, cols, stop_loss, targets, horizon)
+
+
+def run_backtest(histories, infos, stop_loss: float = STOP_LOSS, targets=TARGETS,
+                 horizon: int = 60, picks: int = MAX_PICKS, start=None,
+                 all_pairs: bool = False, processes: int = None, chunk_days: int = 250):
+    """Trades DataFrame (one row per (date, symbol) entry) for the rules given"""
+    closes, highs, lows, market = load_matrices(histories)
+    table = signals(closes, market, infos)
+    rows, cols = select_trades(closes, table, picks=picks, all_pairs=all_pairs)
+    if start is not None:
+        first = closes.index.searchsorted(pd.Timestamp(start))
+        rows, cols = rows[rows >= first], cols[rows >= first]
+
+    padded = padded_matrices(closes, highs, lows, horizon)
+    tasks = []
+    for lo in range(0, len(closes), chunk_days):
+        sel = (rows >= lo) & (rows < lo + chunk_days)
+        if sel.any():
+            tasks.append((rows[sel], cols[sel], stop_loss, targets, horizon))
+
+    processes = processes or os.cpu_count() or 1
+    if processes > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(processes, initializer=_init_worker,
+                                 initargs=(padded, horizon)) as pool:
+            parts = list(pool.map(_evaluate_chunk, tasks))
+    else:
+        future = future_windows(padded, horizon)
+        parts = [evaluate_trades(future, *task) for task in tasks]
+
+    if not parts:
+        return pd.DataFrame()
+    result = {key: np.concatenate([p[key] for p in parts]) for key in parts[0]}
+    rows = np.concatenate([t[0] for t in tasks])
+    cols = np.concatenate([t[1] for t in tasks])
+    return pd.DataFrame({
+        "date": closes.index[rows],
+        "symbol": closes.columns[cols],
+        "risk_score": table["risk_score"][rows, cols],
+        "month_return": table["month_return"][rows, cols],
+        **result,
+    })
+
+
+def summarize(trades, stop_loss: float = STOP_LOSS, targets=TARGETS, horizon: int = 60) -> str:
+    lines = [
+        f"Rules: SL {stop_loss:.0%}, T1 {targets[0]:.0%}, T2 {targets[1]:.0%}, "
+        f"horizon {horizon} days"
+    ]
+    done = trades.loc[~trades["open"]] if not trades.empty else trades
+    if done.empty:
+        lines.append("No completed trades")
+        return "\n".join(lines)
+
+    n = len(done)
+    stop_first = (done["sl_day"] < horizon) & (done["sl_day"] <= done["t1_day"])
+    lines.append(
+        f"Trades: {n} completed ({len(trades) - n} still open), "
+        f"{done['symbol'].nunique()} symbols, "
+        f"{done['date'].min():%Y-%m-%d} .. {done['date'].max():%Y-%m-%d}"
+    )
+    lines.append(f"  T1 before stop : {(done['t1_day'] < done['sl_day']).mean():6.1%}")
+    lines.append(f"  T2 before stop : {(done['t2_day'] < done['sl_day']).mean():6.1%}")
+    lines.append(f"  stop first     : {stop_first.mean():6.1%}")
+    lines.append(
+        f"  neither        : {((done['sl_day'] == horizon) & (done['t1_day'] == horizon)).mean():6.1%}"
+    )
+    for policy in ("t1", "t2"):
+        ret = done[f"ret_{policy}"]
+        lines.append(
+            f"  sell at {policy.upper()}     : avg {ret.mean():+.2f}%  median {ret.median():+.2f}%  "
+            f"win rate {(ret > 0).mean():.1%}"
+        )
+    lines.append(f"  avg days held (T2 policy): {done['days_t2'].mean():.1f}")
+
+    lines.append("By year (sell at T2):")
+    yearly = done.groupby(done["date"].dt.year)["ret_t2"].agg(["count", "mean"])
+    for year, row in yearly.iterrows():
+        lines.append(f"  {year}  {int(row['count']):6d} trades  avg {row['mean']:+.2f}%")
+    return "\n".join(lines)
+
+
+def load_offline(size: int, years: int, seed: int = 0):
+    from price_sources import SyntheticPriceSource
+
+    source = SyntheticPriceSource(seed=seed)
+    symbols = [f"SYN{i:05d}.NS" for i in range(size)]
+    today = datetime.now().date()
+    histories = source.download(
+        symbols + [BENCHMARK], start=today - timedelta(days=365 * years + 400),
+        end=today + timedelta(days=1),
+    )
+    return histories, {sym: source.info(sym) for sym in symbols}
+
+
+def load_stored(symbols, years: int):
+    """History from the local price store, fundamentals from the cache (no network)"""
+    from fundamentals_cache import FundamentalsCache
+    from price_store import PriceStore
+
+    start = datetime.now().date() - timedelta(days=365 * years + 400)
+    store = PriceStore()
+    histories = store.load(list(symbols) + [BENCHMARK], start=start)
+    store.close()
+    cache = FundamentalsCache()
+    infos = {sym: cache._as_info(entry) for sym, entry in cache.entries.items()}
+    return histories, infos
+
+
+def main(argv=None):
+    from stock_universe import add_selection_args, select_from_args
+
+    parser = argparse.ArgumentParser(description="Backtest the medium-risk rules")
+    parser.add_argument("--offline", action="store_true", help="synthetic history")
+    parser.add_argument("--size", type=int, default=2000, help="offline universe size")
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--sl", type=float, default=STOP_LOSS * 100, help="stop loss %%")
+    parser.add_argument("--t1", type=float, default=TARGETS[0] * 100, help="target 1 %%")
+    parser.add_argument("--t2", type=float, default=TARGETS[1] * 100, help="target 2 %%")
+    parser.add_argument("--horizon", type=int, default=60, help="max trading days held")
+    parser.add_argument("--picks", type=int, default=MAX_PICKS, help="picks per date")
+    parser.add_argument("--all-pairs", action="store_true",
+                        help="every in-band (date, stock), not just the daily picks")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--output", help="write the trades CSV here")
+    add_selection_args(parser)
+    args = parser.parse_args(argv)
+
+    t0 = time.perf_counter()
+    if args.offline:
+        histories, infos = load_offline(args.size, args.years)
+    else:
+        histories, infos = load_stored(select_from_args(args), args.years)
+    if len(histories) < 2:
+        print("Not enough stored history - run the daily report first or use --offline")
+        return 1
+    t1 = time.perf_counter()
+
+    rules = {
+        "stop_loss": args.sl / 100,
+        "targets": (args.t1 / 100, args.t2 / 100),
+        "horizon": args.horizon,
+    }
+    trades = run_backtest(
+        histories, infos, picks=args.picks, all_pairs=args.all_pairs,
+        processes=args.processes,
+        start=datetime.now().date() - timedelta(days=365 * args.years), **rules
+    )
+    t2 = time.perf_counter()
+
+    print(summarize(trades, **rules))
+    print(f"\nLoaded {len(histories)} histories in {t1 - t0:.1f}s, "
+          f"backtested {len(trades)} trades in {t2 - t1:.1f}s")
+    if args.output:
+        trades.to_csv(args.output, index=False)
+        print(f"Trades written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
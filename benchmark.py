@@ -0,0 +1,222 @@
+"""
+Offline benchmark suite for the fetch and analysis paths.
+
+Runs the collector, analyzers and PDF renderer against SyntheticPriceSource
+(optionally wrapped in FaultInjectingSource for latency / failures) for
+universes of configurable size, with no network access. Reports wall time,
+throughput, fetch latency percentiles and peak traced memory per stage, and
+compares against a stored baseline (machine-specific, so record one with
+--save-baseline before comparing).
+
+    python benchmark.py                           # 150, 1000, 5000 symbols
+    python benchmark.py --sizes 150 --latency 0.05 --failure-rate 0.05
+    python benchmark.py --save-baseline           # record a new baseline
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+from analyzer import MarketAnalyzer
+from data_collector import StockDataCollector
+from fetch_engine import FetchEngine
+from market_structure import build_market_structure
+from metrics import METRICS
+from price_sources import FaultInjectingSource, SyntheticPriceSource
+from price_store import PriceStore
+from report_generator import create_pdf
+from screens import DEFAULT_SCREENS
+from stock_table import build_stock_table
+
+DEFAULT_SIZES = [150, 1000, 5000]
+DEFAULT_BASELINE = "benchmark_baseline.json"
+
+FETCH_HISTOGRAMS = ["fetch.batch_download_s", "fetch.download_s", "fetch.info_call_s"]
+
+
+def synthetic_universe(size: int):
+    return [f"SYN{i:05d}.NS" for i in range(size)]
+
+
+class StageTimer:
+    """Wall time + peak traced memory for each named stage"""
+
+    def __init__(self, trace_memory: bool = True):
+        self.trace_memory = trace_memory
+        self.results = {}
+
+    def run(self, name: str, items: int, func, *args, **kwargs):
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        # the collector prints a line per symbol; keep the benchmark output readable
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            value = func(*args, **kwargs)
+        seconds = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] / 1e6 if self.trace_memory else 0.0
+        self.results[name] = {
+            "seconds": round(seconds, 4),
+            "items_per_s": round(items / seconds, 1) if seconds > 0 else None,
+            "peak_mb": round(peak, 1),
+        }
+        return value
+
+
+def bench_size(size: int, args):
+    """Benchmark every stage for one universe size; returns {stage: result}"""
+    source = SyntheticPriceSource(seed=args.seed)
+    if args.latency or args.failure_rate or args.throttle_rate:
+        source = FaultInjectingSource(
+            source, latency=args.latency, error_rate=args.failure_rate,
+            throttle_rate=args.throttle_rate, seed=args.seed
+        )
+
+    def collector():
+        c = StockDataCollector(
+            source=source,
+            engine=FetchEngine(workers=args.workers, rate=args.rate, base_delay=0.01),
+            store=PriceStore(":memory:"),
+            history_days=400,
+        )
+        c.stocks = synthetic_universe(size)
+        return c
+
+    METRICS.reset()
+    timer = StageTimer(trace_memory=not args.no_memory)
+    batched = collector()
+    _, all_data = timer.run("collect_batched", size, batched.get_all_data_batched)
+
+    # the per-symbol path is ~10 symbols/s; only run it where it finishes in minutes
+    if not args.skip_per_symbol and size <= args.per_symbol_max:
+        per_symbol = collector()
+        timer.run("collect_per_symbol", size, per_symbol.get_all_stocks_real_data)
+
+    stocks = timer.run("build_table", size, build_stock_table, all_data)
+    sector_perf = timer.run("sector_performance", size, collector().sector_performance, stocks)
+    structure = timer.run(
+        "market_structure", size, build_market_structure, batched.closes, stocks
+    )
+
+    analyzer = MarketAnalyzer()
+    indices = {
+        "nifty": {"current": 22000.0, "change": 110.0, "change_pct": 0.5},
+        "sensex": {"current": 72000.0, "change": 360.0, "change_pct": 0.5},
+    }
+    # the section builders the report stages run, then the in-memory render
+    intraday = timer.run(
+        "intraday_sections", size, analyzer.intraday_sections,
+        indices, stocks, ["Synthetic headline for the benchmark run"], sector_perf,
+        screens=DEFAULT_SCREENS, structure=structure,
+    )
+    portfolio = timer.run(
+        "portfolio_sections", size, analyzer.portfolio_sections, stocks, structure=structure
+    )
+    timer.run("create_pdf", size, create_pdf, intraday, portfolio)
+
+    latency = {}
+    for name in FETCH_HISTOGRAMS:
+        values = METRICS.histograms.get(name)
+        if values:
+            latency[name] = {
+                k: round(v * 1000, 2)
+                for k, v in METRICS.histogram_summary(values).items() if k != "count"
+            }
+            latency[name]["count"] = len(values)
+
+    return {
+        "stages": timer.results,
+        "latency_ms": latency,
+        "stocks_ok": len(all_data),
+        "engine": dict(METRICS.gauges),
+    }
+
+
+def compare(results, baseline, tolerance: float):
+    """Print stage-by-stage comparison; returns the list of regressions"""
+    regressions = []
+    for size, res in results.items():
+        base = baseline.get(size, {}).get("stages", {})
+        for stage, cur in res["stages"].items():
+            ref = base.get(stage)
+            if not ref or not ref.get("seconds"):
+                continue
+            ratio = cur["seconds"] / ref["seconds"]
+            flag = ""
+            if ratio > 1 + tolerance and cur["seconds"] - ref["seconds"] > 0.05:
+                flag = "  REGRESSION"
+                regressions.append(f"{size}/{stage}")
+            print(f"  {size:>6} {stage:24} {ref['seconds']:9.3f}s -> {cur['seconds']:9.3f}s "
+                  f"({ratio:5.2f}x){flag}")
+    return regressions
+
+
+def print_results(results):
+    for size, res in results.items():
+        print(f"\n=== {size} symbols ({res['stocks_ok']} OK) ===")
+        print(f"  {'stage':24} {'seconds':>9} {'items/s':>10} {'peak MB':>8}")
+        for stage, r in res["stages"].items():
+            rate = f"{r['items_per_s']:.0f}" if r["items_per_s"] else "-"
+            print(f"  {stage:24} {r['seconds']:9.3f} {rate:>10} {r['peak_mb']:8.1f}")
+        for name, h in res["latency_ms"].items():
+            print(f"  {name:24} n={h['count']:<6} p50={h['p50']:.1f}ms "
+                  f"p90={h['p90']:.1f}ms p99={h['p99']:.1f}ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmark suite")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--latency", type=float, default=0.0, help="injected seconds per request")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=1000.0, help="fetch engine requests/s")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skip-per-symbol", action="store_true",
+                        help="only benchmark the batched collection path")
+    parser.add_argument("--per-symbol-max", type=int, default=1000,
+                        help="skip the per-symbol path for larger universes")
+    parser.add_argument("--no-memory", action="store_true", help="disable tracemalloc")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed slowdown vs baseline before flagging (0.25 = 25%%)")
+    parser.add_argument("--output", help="write results JSON here")
+    args = parser.parse_args(argv)
+
+    if not args.no_memory:
+        tracemalloc.start()
+
+    results = {}
+    for size in args.sizes:
+        print(f"\nBenchmarking {size} symbols...")
+        results[str(size)] = bench_size(size, args)
+
+    print_results(results)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"\nComparison with {args.baseline}:")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+            return 1
+        print("\nNo regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
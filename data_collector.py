@@ -1,168 +1,479 @@
-import yfinance as yf
-from bs4 import BeautifulSoup
-import requests
 import pandas as pd
 from datetime import datetime, timedelta
-from stock_universe import STOCK_UNIVERSE
-import time
-import random
+from stock_universe import metadata as universe_metadata, select as select_universe
+from price_sources import YahooPriceSource
+from fetch_engine import FetchEngine
+from fetch_journal import RETRY_REASONS
+from metrics import METRICS
+from price_analytics import BENCHMARK, compute_risk_metrics
+from market_structure import closes_window
+from stock_table import sector_performance
+import math
+import threading
+
+INDEX_SYMBOLS = {"nifty": "^NSEI", "sensex": "^BSESN"}
+# stored history starting later than this after the window start is backfilled
+# (weekends and exchange holidays account for a few days)
+BACKFILL_SLACK_DAYS = 7
+
+
+def summarize_index(df):
+    cur = float(df["Close"].iloc[-1])
+    prev = float(df["Close"].iloc[-2])
+    ch = cur - prev
+    ch_pct = (ch / prev * 100) if prev != 0 else 0
+    return {
+        "current": round(cur, 2),
+        "prev_close": round(prev, 2),
+        "change": round(ch, 2),
+        "change_pct": round(ch_pct, 2),
+    }
+
+
+def last_session(today=None):
+    """Date of the latest weekday session (weekends roll back to Friday)"""
+    today = today or datetime.now().date()
+    return today - timedelta(days=max(0, today.weekday() - 4))
+
+
+def _first_number(*values):
+    """First value that is a finite number, else NaN"""
+    for v in values:
+        try:
+            v = float(v)
+        except (TypeError, ValueError):
+            continue
+        if math.isfinite(v):
+            return v
+    return float("nan")
+
+
+def build_stock_record(symbol: str, hist, info, metrics=None, meta=None):
+    """
+    Validate one symbol's analysis window and turn it into a stock record.
+    `metrics` is the symbol's row from compute_risk_metrics(); ticker.info is
+    only a fallback for the price-derived fields. Beta stays NaN when neither
+    has it. Name and sector come from the universe file row `meta` when
+    present. Returns None if the data is missing or corrupted.
+    """
+    if hist is None or hist.empty or len(hist) < 20:
+        return None
+
+    if hist["Close"].isnull().any():
+        return None
+
+    current_price = float(hist["Close"].iloc[-1])
+    if current_price <= 0:
+        return None
+
+    metrics = metrics if metrics is not None else {}
+    meta = meta or {}
+    month_return = _first_number(
+        metrics.get("month_return"),
+        (hist["Close"].iloc[-1] - hist["Close"].iloc[0]) / hist["Close"].iloc[0] * 100,
+    )
+    volatility = _first_number(
+        metrics.get("volatility"), hist["Close"].pct_change().std() * 100
+    )
+    beta = _first_number(metrics.get("beta"), info.get("beta"))
+
+    return {
+        "symbol": symbol.replace(".NS", ""),
+        "name": meta.get("name") or info.get("shortName", symbol.replace(".NS", "")),
+        "sector": meta.get("sector") or info.get("sector", "N/A"),
+        "current_price": round(current_price, 2),
+        "pe_ratio": float(info.get("trailingPE") or 0),
+        "pb_ratio": float(info.get("priceToBook") or 0),
+        "market_cap": int(info.get("marketCap") or 0),
+        "beta": round(beta, 2),
+        "dividend_yield": float(info.get("dividendYield") or 0) * 100,
+        "week52_high": _first_number(
+            metrics.get("week52_high"), info.get("fiftyTwoWeekHigh"), current_price
+        ),
+        "week52_low": _first_number(
+            metrics.get("week52_low"), info.get("fiftyTwoWeekLow"), current_price
+        ),
+        "month_return": round(month_return, 2),
+        "volatility": round(volatility, 2),
+    }
+
 
 class StockDataCollector:
-    def __init__(self):
-        self.stocks = STOCK_UNIVERSE
+    def __init__(self, source=None, batch_size: int = 50, engine=None, store=None,
+                 history_days: int = 60, fundamentals=None, analysis_days: int = 60,
+                 journal=None, stocks=None):
+        self.stocks = list(stocks) if stocks is not None else select_universe()
+        self.source = source or YahooPriceSource()
+        self.batch_size = batch_size
+        self.engine = engine or FetchEngine()
+        self.store = store
+        self.history_days = max(history_days, analysis_days)
+        self.analysis_days = analysis_days
+        self.fundamentals = fundamentals
+        self.journal = journal
+        # recent daily closes of the collected stocks, for market_structure
+        self.closes = None
         self.headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
         }
 
-    def get_market_indices_real_only(self):
+    def _indices_from_histories(self, histories):
+        nifty_hist = histories.get(INDEX_SYMBOLS["nifty"])
+        sensex_hist = histories.get(INDEX_SYMBOLS["sensex"])
+        if nifty_hist is not None:
+            nifty_hist = nifty_hist.dropna(subset=["Close"])
+        if sensex_hist is not None:
+            sensex_hist = sensex_hist.dropna(subset=["Close"])
+
+        if (nifty_hist is None or sensex_hist is None
+                or len(nifty_hist) < 2 or len(sensex_hist) < 2):
+            print("Warning: Insufficient index data - continuing without indices")
+            return None
+
+        nifty_data = summarize_index(nifty_hist)
+        sensex_data = summarize_index(sensex_hist)
+
+        print(f"NIFTY: {nifty_data['current']} ({nifty_data['change_pct']:+.2f}%)")
+        print(f"SENSEX: {sensex_data['current']} ({sensex_data['change_pct']:+.2f}%)")
+
+        return {"nifty": nifty_data, "sensex": sensex_data}
+
+    def _delta_starts(self, symbols, window_start):
         """
-        REAL DATA ONLY - No fallback, no dummy data.
-        If indices fail, we skip them but continue with stock analysis.
+        First date to download per symbol: the window start, or with a price
+        store the last stored bar (re-fetched in case it was partial). Stored
+        history that starts well after the window start (a store built with a
+        shorter window) is downloaded again from the window start, once: if
+        the source was already asked for that far back (a recent listing),
+        it has nothing older.
         """
-        try:
-            print("Fetching real NIFTY & SENSEX data...")
-            time.sleep(2)
-            
-            nifty = yf.Ticker("^NSEI")
-            sensex = yf.Ticker("^BSESN")
-            
-            nifty_hist = nifty.history(period="30d")
-            sensex_hist = sensex.history(period="30d")
-            
-            if len(nifty_hist) < 2 or len(sensex_hist) < 2:
-                print("Warning: Insufficient index data - continuing without indices")
+        if self.store is None:
+            return {sym: window_start for sym in symbols}
+        first = self.store.first_dates(symbols)
+        last = self.store.last_dates(symbols)
+        requested = self.store.requested_since(symbols)
+        backfill = window_start + timedelta(days=BACKFILL_SLACK_DAYS)
+
+        def complete(sym):
+            return first[sym] <= backfill or requested.get(sym, first[sym]) <= backfill
+
+        return {
+            sym: max(last[sym], window_start)
+            if sym in last and complete(sym) else window_start
+            for sym in symbols
+        }
+
+    def fetch_stock(self, symbol: str):
+        """
+        Fetch and validate one symbol. Returns None if data is missing or
+        corrupted; raises on network/throttle errors so the engine retries.
+        """
+        today = datetime.now().date()
+        window_start = today - timedelta(days=self.history_days)
+        start = self._delta_starts([symbol], window_start)[symbol]
+
+        with METRICS.timer("fetch.download_s"):
+            hist = self.source.download(
+                [symbol], start=start, end=today + timedelta(days=1)
+            ).get(symbol)
+
+        if self.store is not None:
+            if hist is not None:
+                self.store.save({symbol: hist}, since=start)
+            elif self.store.last_dates([symbol]).get(symbol) != last_session(today):
+                # nothing downloaded: older stored bars are not current prices
                 return None
+            hist = self.store.load([symbol], start=window_start).get(symbol)
 
-            def summarize(df):
-                cur = float(df["Close"].iloc[-1])
-                prev = float(df["Close"].iloc[-2])
-                ch = cur - prev
-                ch_pct = (ch / prev * 100) if prev != 0 else 0
-                return {
-                    "current": round(cur, 2),
-                    "prev_close": round(prev, 2),
-                    "change": round(ch, 2),
-                    "change_pct": round(ch_pct, 2),
-                }
-
-            nifty_data = summarize(nifty_hist)
-            sensex_data = summarize(sensex_hist)
-            
-            print(f"NIFTY: {nifty_data['current']} ({nifty_data['change_pct']:+.2f}%)")
-            print(f"SENSEX: {sensex_data['current']} ({sensex_data['change_pct']:+.2f}%)")
-            
-            return {"nifty": nifty_data, "sensex": sensex_data}
-            
-        except Exception as e:
-            print(f"Index fetch failed: {e}")
-            print("Will continue with stock analysis only")
+        if hist is None or hist.empty:
+            return None
+
+        window = self._analysis_window(hist)
+        if len(window) < 20:
             return None
 
+        histories = {symbol: hist}
+        if self.store is not None:
+            histories.update(self.store.load([BENCHMARK], start=window_start))
+        metrics = compute_risk_metrics(histories, window_days=self.analysis_days)
+        with METRICS.timer("fetch.info_s"):
+            info = self._info(symbol)
+        return build_stock_record(
+            symbol, window, info, metrics.loc[symbol], universe_metadata(symbol)
+        )
+
+    def _analysis_window(self, hist):
+        cutoff = pd.Timestamp(datetime.now().date() - timedelta(days=self.analysis_days))
+        return hist.loc[hist.index >= cutoff]
+
+    def _timed_info(self, symbol: str):
+        with METRICS.timer("fetch.info_call_s"):
+            return self.source.info(symbol)
+
+    def _info(self, symbol: str):
+        if self.fundamentals is None:
+            return self.source.info(symbol)
+        return self.fundamentals.get(symbol, self._timed_info)
+
+    def _infos(self, symbols, on_info):
+        """
+        Fundamentals for many symbols: cache first, engine for the rest.
+        `on_info(symbol, info, error)` is called as each one is known;
+        returns {symbol: error} of the failed fetches.
+        """
+        errors = {}
+
+        def fetch_many(syms, on_result):
+            return self.engine.run(syms, self._timed_info, on_result=on_result)
+
+        def track(sym, info, error):
+            if error is not None:
+                errors[sym] = error
+            on_info(sym, info, error)
+
+        if self.fundamentals is None:
+            fetch_many(symbols, track)
+        else:
+            self.fundamentals.get_many(symbols, fetch_many, on_result=track)
+        return errors
+
     def get_stock_data_verified(self, symbol: str):
         """
         Fetch REAL stock data only. Skip if any data is missing or corrupted.
-        No retry, no fallback - either we get real data or skip.
+        Transient errors are retried with backoff; no fallback data.
         """
         try:
-            time.sleep(random.uniform(1, 2))
-            
-            today = datetime.now().date()
-            start = today - timedelta(days=60)
-            
-            hist = yf.download(
-                symbol, start=start, end=today + timedelta(days=1),
-                interval="1d", progress=False, timeout=15
-            )
-            
-            if hist.empty or len(hist) < 20:
-                return None
-            
-            if hist["Close"].isnull().any():
-                return None
-            
-            ticker = yf.Ticker(symbol)
-            info = ticker.info
-            
-            current_price = float(hist["Close"].iloc[-1])
-            if current_price <= 0:
-                return None
-            
-            month_return = (
-                (hist["Close"].iloc[-1] - hist["Close"].iloc[0])
-                / hist["Close"].iloc[0] * 100
-            )
-            
-            volatility = hist["Close"].pct_change().std() * 100
-            
-            return {
-                "symbol": symbol.replace(".NS", ""),
-                "name": info.get("shortName", symbol.replace(".NS", "")),
-                "sector": info.get("sector", "N/A"),
-                "current_price": round(current_price, 2),
-                "pe_ratio": float(info.get("trailingPE") or 0),
-                "pb_ratio": float(info.get("priceToBook") or 0),
-                "market_cap": int(info.get("marketCap") or 0),
-                "beta": float(info.get("beta") or 1),
-                "dividend_yield": float(info.get("dividendYield") or 0) * 100,
-                "week52_high": float(info.get("fiftyTwoWeekHigh") or current_price),
-                "week52_low": float(info.get("fiftyTwoWeekLow") or current_price),
-                "month_return": round(float(month_return), 2),
-                "volatility": round(float(volatility), 2),
-            }
-        
+            return self.engine.call(self.fetch_stock, symbol)
         except Exception as e:
             return None
 
-    def get_all_stocks_real_data(self):
-        """Fetch ONLY stocks with verified real data"""
-        data = []
-        failed = []
-        total = len(self.stocks)
-        
-        for idx, sym in enumerate(self.stocks, 1):
-            stock_data = self.get_stock_data_verified(sym)
-            
+    def _progress(self, total: int):
+        done = [0]
+        lock = threading.Lock()
+
+        def report(sym, stock_data, error, reason=None):
+            with lock:
+                done[0] += 1
+                idx = done[0]
             if stock_data:
-                data.append(stock_data)
                 print(f"[{idx}/{total}] OK {sym:15} Rs {stock_data['current_price']:>8.2f}")
             else:
-                failed.append(sym)
-                print(f"[{idx}/{total}] XX {sym:15} (skip)")
-            
-            if idx % 15 == 0:
-                print(f"    Checkpoint: {idx}/{total}, wait 3s...")
-                time.sleep(3)
-        
-        print(f"\nResults: {len(data)} stocks OK, {len(failed)} skipped")
+                reason = reason or ("fetch error" if error else "no valid data")
+                METRICS.skip(sym, reason)
+                print(f"[{idx}/{total}] XX {sym:15} ({error or 'skip'})")
+            if self.journal is not None:
+                failed = error is not None or reason in RETRY_REASONS
+                self.journal.add(sym, stock_data or None, reason, failed)
+
+        return report
+
+    def _resume(self):
+        """Symbols still to fetch; with a journal, those not completed earlier today"""
+        if self.journal is None:
+            return list(self.stocks)
+        done = self.journal.completed()
+        pending = self.journal.pending(self.stocks)
+        resumed = len(self.stocks) - len(pending)
+        if resumed:
+            print(f"Resuming from {self.journal.path}: {resumed} done, "
+                  f"{len(pending)} to fetch")
+            for sym in self.stocks:
+                entry = done.get(sym)
+                if entry and entry.get("record") is None:
+                    METRICS.skip(sym, entry["reason"])
+        METRICS.gauge("journal.resumed", resumed)
+        return pending
+
+    def _merge(self, results):
+        if self.journal is None:
+            return [results[sym] for sym in self.stocks if results.get(sym)]
+        data = self.journal.merge(self.stocks, results)
+        self.journal.close()
+        return data
+
+    def _report_results(self, data, errors, total: int):
+        skipped = total - len(data)
+        print(f"\nResults: {len(data)} stocks OK, {skipped} skipped "
+              f"({len(errors)} after retries)")
         print(f"Success: {len(data)/total*100:.1f}%")
+        print(f"Fetch engine: {self.engine.summary()}")
+        METRICS.gauge("stocks.ok", len(data))
+        METRICS.gauge("stocks.skipped", skipped)
+        for key, value in self.engine.stats.items():
+            METRICS.gauge(f"engine.{key}", value)
+        METRICS.gauge("engine.breaker_trips", self.engine.breaker.trips)
+        if self.fundamentals is not None:
+            self.fundamentals.save()
+            print(f"Fundamentals cache: {self.fundamentals.summary()}")
+            for key, value in self.fundamentals.stats.items():
+                METRICS.gauge(f"fundamentals.{key}", value)
+
+    def get_all_stocks_real_data(self):
+        """Fetch ONLY stocks with verified real data"""
+        total = len(self.stocks)
+        symbols = self._resume()
+        results, errors = self.engine.run(
+            symbols, self.fetch_stock, on_result=self._progress(len(symbols))
+        )
+
+        data = self._merge(results)
+        self._report_results(data, errors, total)
         
         return data
 
-    def scrape_market_news(self, limit: int = 10):
-        """Scrape REAL market news"""
-        news = []
-        urls = [
-            "https://economictimes.indiatimes.com/markets/stocks/news",
-            "https://www.moneycontrol.com/news/business/markets/",
+    def download_histories(self, symbols, days: int = 60, start=None, interval: str = "1d",
+                           on_chunk=None):
+        """
+        Download OHLCV (daily by default) for many symbols in chunked
+        multi-ticker requests. Returns {symbol: DataFrame}; symbols Yahoo
+        returned nothing for are absent. `on_chunk(frames)` gets each chunk's
+        frames as soon as it is downloaded.
+        """
+        today = datetime.now().date()
+        start = start or today - timedelta(days=days)
+        end = today + timedelta(days=1)
+
+        symbols = list(symbols)
+        chunks = [
+            tuple(symbols[i:i + self.batch_size])
+            for i in range(0, len(symbols), self.batch_size)
         ]
-        
-        for url in urls:
-            try:
-                r = requests.get(url, headers=self.headers, timeout=10)
-                soup = BeautifulSoup(r.text, "lxml")
-                for h in soup.find_all(["h2", "h3"], limit=limit):
-                    text = h.get_text(strip=True)
-                    if text and len(text) > 20:
-                        news.append(text)
-            except:
-                pass
-        
-        return list(dict.fromkeys(news))[:limit]
+
+        def fetch_chunk(chunk):
+            with METRICS.timer("fetch.batch_download_s"):
+                return self.source.download(
+                    list(chunk), start=start, end=end, interval=interval
+                )
+
+        def report(chunk, frames, error):
+            if error:
+                print(f"    Batch of {len(chunk)} failed: {error}")
+            else:
+                print(f"    Batch: {len(frames)}/{len(chunk)} symbols")
+                if on_chunk is not None:
+                    on_chunk(frames)
+
+        results, _ = self.engine.run(chunks, fetch_chunk, on_result=report)
+
+        histories = {}
+        for frames in results.values():
+            histories.update(frames)
+        return histories
+
+    def load_histories(self, symbols, days: int = None):
+        """
+        Daily OHLCV for `symbols` over the last `days` days. With a price store
+        only the bars since each symbol's last stored bar are downloaded; a
+        symbol whose download failed or came back empty is served from the
+        store only if it already holds the latest session's bar.
+        """
+        days = days or self.history_days
+        symbols = list(symbols)
+        if self.store is None:
+            return self.download_histories(symbols, days=days)
+
+        window_start = datetime.now().date() - timedelta(days=days)
+        groups = {}
+        for sym, start in self._delta_starts(symbols, window_start).items():
+            groups.setdefault(start, []).append(sym)
+
+        fresh = set()
+
+        def saver(start):
+            def save(frames):
+                # each chunk is stored as it lands, so a killed run keeps it
+                METRICS.incr("store.bars_downloaded", self.store.save(frames, since=start))
+                fresh.update(frames)
+            return save
+
+        for start, group in sorted(groups.items()):
+            print(f"    Delta fetch since {start}: {len(group)} symbols")
+            self.download_histories(group, start=start, on_chunk=saver(start))
+
+        session = last_session()
+        last = self.store.last_dates([sym for sym in symbols if sym not in fresh])
+        current = [sym for sym in symbols if sym in fresh or last.get(sym) == session]
+        if len(current) < len(symbols):
+            print(f"    {len(symbols) - len(current)} symbols not refreshed today - skipped")
+            METRICS.incr("store.stale_skipped", len(symbols) - len(current))
+
+        histories = self.store.load(current, start=window_start)
+        METRICS.incr("store.bars_served", sum(len(h) for h in histories.values()))
+        return histories
+
+    def get_all_data_batched(self):
+        """
+        Batched mode: indices + whole universe in a few multi-ticker downloads,
+        then the usual per-symbol validation over the combined result.
+        Returns (indices, stocks_data) like the two per-symbol calls.
+        """
+        symbols = self._resume()
+        print(f"Batch-downloading {len(symbols)} stocks + indices...")
+        with METRICS.stage("collect.prices"):
+            histories = self.load_histories(symbols + list(INDEX_SYMBOLS.values()))
+
+        indices = self._indices_from_histories(histories)
+
+        print("Computing beta / volatility / 52W range from the price matrix...")
+        with METRICS.stage("collect.analytics"):
+            metrics = compute_risk_metrics(histories, window_days=self.analysis_days)
+
+        windows = {
+            sym: self._analysis_window(histories[sym])
+            for sym in symbols if sym in histories
+        }
+        candidates = [sym for sym in symbols if len(windows.get(sym, ())) >= 20]
+
+        report = self._progress(len(symbols))
+        for sym in symbols:
+            if len(windows.get(sym, ())) < 20:
+                reason = "no price data" if sym not in histories else "insufficient history"
+                report(sym, None, None, reason)
+
+        results = {}
+
+        def on_info(sym, info, error):
+            # journaled as each symbol's fundamentals arrive, not after all of them
+            if info is None:
+                report(sym, None, error, "info fetch error")
+                return
+            stock_data = build_stock_record(
+                sym, windows[sym], info, metrics.loc[sym], universe_metadata(sym)
+            )
+            if stock_data:
+                results[sym] = stock_data
+                report(sym, stock_data, None)
+            else:
+                report(sym, None, None, "invalid data")
+
+        with METRICS.stage("collect.fundamentals"):
+            errors = self._infos(candidates, on_info)
+
+        data = self._merge(results)
+        self._report_results(data, errors, len(self.stocks))
+        self.closes = self._closes(histories, data)
+
+        return indices, data
+
+    def _closes(self, histories, data):
+        """Closes window of every collected stock; resumed ones come from the store"""
+        collected = {record["symbol"] for record in data}
+        symbols = [sym for sym in self.stocks if sym.replace(".NS", "") in collected]
+        missing = [sym for sym in symbols if sym not in histories]
+        if missing and self.store is not None:
+            start = datetime.now().date() - timedelta(days=self.history_days)
+            histories = {**histories, **self.store.load(missing, start=start)}
+        return closes_window(histories, symbols)
+
+    def scrape_market_news(self, limit: int = 10, sources=None):
+        """Scrape REAL market news - all sources concurrently, cached by ETag"""
+        from news_scraper import NewsScraper
+
+        scraper = NewsScraper(sources=sources, headers=self.headers)
+        news = scraper.scrape(limit)
+        print(f"News sources: {scraper.summary()}")
+        return news
 
     def sector_performance(self, all_data):
         """Calculate REAL sector performance from actual stock data"""
-        if not all_data:
-            return {}
-        df = pd.DataFrame(all_data)
-        grp = df.groupby("sector")["month_return"].mean().sort_values(ascending=False)
-        return grp.to_dict()
+        return sector_performance(all_data)
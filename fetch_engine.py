@@ -0,0 +1,190 @@
+"""
+Concurrent fetch engine: bounded worker pool + token-bucket rate limit,
+per-item retry with exponential backoff and jitter, and a circuit breaker
+that slows the request rate down when the upstream starts throttling.
+"""
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ThrottledError(Exception):
+    """Upstream answered with HTTP 429 / rate-limit"""
+
+
+def is_throttle_error(exc) -> bool:
+    if isinstance(exc, ThrottledError):
+        return True
+    msg = str(exc).lower()
+    return "429" in msg or "too many requests" in msg or "rate limit" in msg
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, bursts up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def set_rate(self, rate: float):
+        with self.lock:
+            self._refill()
+            self.rate = float(rate)
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive throttle errors: every worker pauses for
+    `cooldown` seconds and the bucket rate is halved (down to `min_rate`).
+    Each `recover_after` successes afterwards step the rate back up.
+    """
+
+    def __init__(self, bucket: TokenBucket, threshold: int = 3, cooldown: float = 10.0,
+                 min_rate: float = 0.2, recover_after: int = 20):
+        self.bucket = bucket
+        self.base_rate = bucket.rate
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.min_rate = min_rate
+        self.recover_after = recover_after
+        self.throttles = 0
+        self.successes = 0
+        self.open_until = 0.0
+        self.trips = 0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        delay = self.open_until - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def record_throttle(self):
+        with self.lock:
+            self.successes = 0
+            self.throttles += 1
+            if self.throttles < self.threshold:
+                return
+            self.throttles = 0
+            self.trips += 1
+            self.open_until = time.monotonic() + self.cooldown
+            new_rate = max(self.min_rate, self.bucket.rate / 2)
+        self.bucket.set_rate(new_rate)
+        print(f"    Throttled by upstream - pausing {self.cooldown:.1f}s, rate now {new_rate:.2f}/s")
+
+    def record_success(self):
+        with self.lock:
+            self.throttles = 0
+            self.successes += 1
+            if self.bucket.rate >= self.base_rate or self.successes < self.recover_after:
+                return
+            self.successes = 0
+            new_rate = min(self.base_rate, self.bucket.rate * 1.5)
+        self.bucket.set_rate(new_rate)
+
+
+class FetchEngine:
+    """
+    Run `fetch(item)` for many items on a bounded thread pool.
+
+    A fetch returning a value (including None for "no valid data") is final;
+    a fetch raising is retried up to `max_retries` times with exponential
+    backoff + jitter. Wall-clock time is bounded by `rate`, not by sleeps.
+    """
+
+    def __init__(self, workers: int = 8, rate: float = 4.0, max_retries: int = 3,
+                 base_delay: float = 1.0, max_delay: float = 30.0,
+                 breaker_threshold: int = 3, breaker_cooldown: float = 10.0):
+        self.workers = workers
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.bucket = TokenBucket(rate)
+        self.breaker = CircuitBreaker(
+            self.bucket, threshold=breaker_threshold, cooldown=breaker_cooldown
+        )
+        self.stats = {"requests": 0, "retries": 0, "throttled": 0, "failed": 0}
+        self.stats_lock = threading.Lock()
+
+    def _count(self, key: str):
+        with self.stats_lock:
+            self.stats[key] += 1
+
+    def backoff(self, attempt: int) -> float:
+        delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def call(self, fetch, item):
+        """Run one fetch with rate limiting and retries; raises the last error"""
+        for attempt in range(self.max_retries + 1):
+            self.breaker.wait()
+            self.bucket.acquire()
+            self._count("requests")
+            try:
+                result = fetch(item)
+            except Exception as e:
+                if is_throttle_error(e):
+                    self._count("throttled")
+                    self.breaker.record_throttle()
+                if attempt == self.max_retries:
+                    raise
+                self._count("retries")
+                time.sleep(self.backoff(attempt))
+            else:
+                self.breaker.record_success()
+                return result
+
+    def run(self, items, fetch, on_result=None):
+        """
+        Fetch every item concurrently.
+        Returns (results, errors): {item: value} and {item: error message}.
+        `on_result(item, value, error)` is called as each item finishes.
+        """
+        items = list(items)
+        results = {}
+        errors = {}
+
+        def task(item):
+            try:
+                value, error = self.call(fetch, item), None
+            except Exception as e:
+                self._count("failed")
+                value, error = None, str(e) or type(e).__name__
+            if on_result:
+                on_result(item, value, error)
+            return item, value, error
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for item, value, error in pool.map(task, items):
+                if error is None:
+                    results[item] = value
+                else:
+                    errors[item] = error
+
+        return results, errors
+
+    def summary(self) -> str:
+        s = self.stats
+        return (
+            f"{s['requests']} requests, {s['retries']} retries, "
+            f"{s['throttled']} throttled, {s['failed']} failed, "
+            f"{self.breaker.trips} breaker trips"
+        )
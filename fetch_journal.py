@@ -0,0 +1,96 @@
+"""
+Checkpoint journal for the universe fetch.
+
+Every per-symbol outcome (the stock record, or the skip reason) is appended
+to cache/journal_<day>.jsonl (one file per shard when sharded) as soon as it is known and flushed, so a job
+that dies partway loses nothing. A rerun on the same trading day resumes:
+symbols with a record or a final skip are served from the journal and only
+missing / failed ones are fetched again. Journals of older days are deleted.
+"""
+import json
+import os
+import threading
+from datetime import datetime
+
+DEFAULT_JOURNAL_DIR = "cache"
+
+# Skips worth retrying on resume; the rest (short history, invalid data) are final for the day
+RETRY_REASONS = {"fetch error", "no price data", "info fetch error"}
+
+
+class FetchJournal:
+    def __init__(self, directory: str = DEFAULT_JOURNAL_DIR, day: str = None,
+                 resume: bool = True, tag: str = ""):
+        self.directory = directory
+        self.day = day or datetime.now().date().isoformat()
+        self.path = os.path.join(directory, f"journal_{self.day}{tag}.jsonl")
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.file = None
+        os.makedirs(directory, exist_ok=True)
+        self._prune()
+        if resume:
+            self._load()
+        elif os.path.exists(self.path):
+            os.remove(self.path)
+
+    def _prune(self):
+        for name in os.listdir(self.directory):
+            if (name.startswith("journal_") and name.endswith(".jsonl")
+                    and not name.startswith(f"journal_{self.day}")):
+                os.remove(os.path.join(self.directory, name))
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # last line of a killed run may be cut short
+                    continue
+                self.entries[entry["symbol"]] = entry
+
+    @staticmethod
+    def _done(entry) -> bool:
+        return entry.get("record") is not None or not entry.get("failed")
+
+    def completed(self):
+        """{symbol: entry} for symbols that need no refetch"""
+        return {sym: e for sym, e in self.entries.items() if self._done(e)}
+
+    def pending(self, symbols):
+        """`symbols` (in order) that are missing from the journal or failed"""
+        done = self.completed()
+        return [sym for sym in symbols if sym not in done]
+
+    def add(self, symbol: str, record=None, reason: str = None, failed: bool = False):
+        entry = {"symbol": symbol, "record": record, "reason": reason, "failed": failed}
+        line = json.dumps(entry)
+        with self.lock:
+            self.entries[symbol] = entry
+            if self.file is None:
+                self.file = open(self.path, "a")
+            self.file.write(line + "\n")
+            self.file.flush()
+
+    def merge(self, symbols, results):
+        """
+        Records for `symbols` in universe order: this run's `results` first,
+        then the journal, so the list matches an uninterrupted run.
+        """
+        data = []
+        for sym in symbols:
+            record = results.get(sym)
+            if not record and sym in self.entries:
+                record = self.entries[sym].get("record")
+            if record:
+                data.append(record)
+        return data
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
@@ -0,0 +1,253 @@
+"""
+TTL cache for ticker fundamentals (Yahoo `ticker.info`), kept apart from
+the price fetch. `info` is the slowest, most rate-limited Yahoo endpoint,
+while the few fields we use change weekly at most.
+
+Each field has its own TTL; an entry is stale once any field outlives it.
+Stale entries are still served, and at most `max_refresh` of the stalest
+are re-fetched per run, i.e. per cache instance (optionally in a background
+thread). refresh_budget() sizes that cap from the universe and the shortest
+TTL, so every entry is refreshed within its TTL while a run never re-fetches
+more than a full TTL cycle's worth. Fetched entries are saved every
+`save_every` as they arrive, so a run that dies partway keeps them.
+"""
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+import zlib
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, one process per cache
+    fcntl = None
+
+DEFAULT_CACHE_PATH = os.path.join("cache", "fundamentals.json")
+
+DAY = 24 * 3600
+FIELD_TTLS = {
+    "shortName": 30 * DAY,
+    "sector": 30 * DAY,
+    "beta": 7 * DAY,
+    "trailingPE": DAY,
+    "priceToBook": DAY,
+    "marketCap": DAY,
+    "dividendYield": DAY,
+    "fiftyTwoWeekHigh": DAY,
+    "fiftyTwoWeekLow": DAY,
+}
+
+
+def refresh_budget(symbols: int, ttls=None, run_every: float = DAY,
+                   rate: float = None, seconds: float = None) -> int:
+    """
+    max_refresh that keeps `symbols` entries within their shortest TTL when
+    the cache is used every `run_every` seconds (TTL jitter shortens it by
+    up to 20%), capped at what `rate` info calls per second can finish in
+    `seconds` - a background refresh still running at exit is lost.
+    """
+    shortest = 0.8 * min((ttls or FIELD_TTLS).values())
+    budget = math.ceil(symbols * run_every / shortest)
+    if rate is not None and seconds is not None:
+        budget = min(budget, int(rate * seconds))
+    return budget
+
+
+class FundamentalsCache:
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, ttls=None,
+                 max_refresh: int = None, background: bool = False, save_every: int = 25):
+        self.path = path
+        self.ttls = ttls or FIELD_TTLS
+        self.max_refresh = max_refresh
+        self.background = background
+        # fetched entries are written out every `save_every`, so a killed run keeps them
+        self.save_every = save_every
+        self.unsaved = 0
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.save_lock = threading.Lock()
+        self.refreshers = []
+        self.scheduled = 0
+        self.stats = {"hits": 0, "stale": 0, "misses": 0, "refreshed": 0, "errors": 0}
+        if os.path.exists(path):
+            try:
+                with open(path) as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError):
+                print(f"Fundamentals cache unreadable, starting empty: {path}")
+
+    def _ttl(self, symbol: str, field: str) -> float:
+        # Up to 20% per-symbol jitter so entries cached together expire apart
+        jitter = (zlib.crc32(symbol.encode()) % 1000) / 1000
+        return self.ttls[field] * (0.8 + 0.2 * jitter)
+
+    def _expires_in(self, symbol: str, entry, now: float) -> float:
+        return min(
+            entry[field][1] + self._ttl(symbol, field) - now if field in entry else -1
+            for field in self.ttls
+        )
+
+    def _store(self, symbol: str, info, now: float):
+        self.entries[symbol] = {
+            field: [info.get(field), now] for field in self.ttls
+        }
+
+    @staticmethod
+    def _as_info(entry):
+        return {field: value for field, (value, _) in entry.items() if value is not None}
+
+    def get_many(self, symbols, fetch_many, on_result=None):
+        """
+        {symbol: info} for `symbols`. `fetch_many(symbols, on_result)` must
+        call `on_result(symbol, info, error)` as each fetch finishes and is
+        only called for misses and for the stale subset chosen for refresh
+        this run. Our own `on_result(symbol, info, error)` hears about every
+        symbol as soon as its info is known: cached ones at once, misses as
+        they arrive (info None if the fetch failed).
+        """
+        now = time.time()
+        result = {}
+        misses = []
+        stale = []
+        with self.lock:
+            for sym in symbols:
+                entry = self.entries.get(sym)
+                if entry is None:
+                    misses.append(sym)
+                    continue
+                result[sym] = self._as_info(entry)
+                expires_in = self._expires_in(sym, entry, now)
+                if expires_in > 0:
+                    self.stats["hits"] += 1
+                else:
+                    self.stats["stale"] += 1
+                    stale.append((expires_in, sym))
+            self.stats["misses"] += len(misses)
+
+            stale = [sym for _, sym in sorted(stale)]
+            if self.max_refresh is not None:
+                stale = stale[:max(self.max_refresh - self.scheduled, 0)]
+            self.scheduled += len(stale)
+
+        if on_result:
+            waiting = set() if self.background else set(stale)
+            for sym, info in result.items():
+                if sym not in waiting:
+                    on_result(sym, info, None)
+
+        if misses:
+            result.update(self._refresh(misses, fetch_many, on_result))
+
+        if stale and self.background:
+            refresher = threading.Thread(
+                target=self._refresh_and_save, args=(stale, fetch_many), daemon=True
+            )
+            refresher.start()
+            self.refreshers.append(refresher)
+        elif stale:
+            result.update(self._refresh(stale, fetch_many))
+            if on_result:
+                # a failed refresh still serves the cached value
+                for sym in stale:
+                    on_result(sym, result[sym], None)
+
+        return result
+
+    def get(self, symbol: str, fetch):
+        """Single-symbol lookup; `fetch(symbol)` returns the raw info dict"""
+        def fetch_many(symbols, on_result):
+            for sym in symbols:
+                on_result(sym, fetch(sym), None)
+        return self.get_many([symbol], fetch_many).get(symbol, {})
+
+    def _refresh(self, symbols, fetch_many, on_result=None):
+        """Fetch `symbols`, storing each as it arrives; {symbol: info} of the fetched"""
+        refreshed = {}
+
+        def store(sym, info, error):
+            with self.lock:
+                if error is None:
+                    self._store(sym, info or {}, time.time())
+                    self.stats["refreshed"] += 1
+                    refreshed[sym] = self._as_info(self.entries[sym])
+                    self.unsaved += 1
+                else:
+                    self.stats["errors"] += 1
+                due = self.unsaved >= self.save_every
+                if due:
+                    self.unsaved = 0
+            if due:
+                self.save()
+            if on_result:
+                on_result(sym, refreshed.get(sym), error)
+
+        fetch_many(symbols, store)
+        return refreshed
+
+    def _refresh_and_save(self, symbols, fetch_many):
+        self._refresh(symbols, fetch_many)
+        self.save()
+
+    def wait(self, timeout: float = None):
+        """Wait for background refreshes started by get_many()"""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        for refresher in self.refreshers:
+            remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+            refresher.join(remaining)
+
+    def _merge_disk(self):
+        """
+        Our entries combined with what is on disk now, newest field value
+        winning, so processes sharing the file (shards) keep each other's work.
+        """
+        try:
+            with open(self.path) as f:
+                merged = json.load(f)
+        except (OSError, ValueError):
+            merged = {}
+        for sym, entry in self.entries.items():
+            old = merged.get(sym, {})
+            merged[sym] = {
+                field: max(
+                    (v for v in (old.get(field), entry.get(field)) if v is not None),
+                    key=lambda v: v[1],
+                )
+                for field in set(old) | set(entry)
+            }
+        return merged
+
+    def save(self):
+        """
+        Merge with the file on disk and replace it. Processes sharing the file
+        take turns on a lock file around read, merge and replace, and each
+        writes its own temporary file.
+        """
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        with self.save_lock, open(f"{self.path}.lock", "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            with self.lock:
+                payload = json.dumps(self._merge_disk())
+                self.unsaved = 0
+            fd, tmp = tempfile.mkstemp(
+                dir=directory, prefix=f".{os.path.basename(self.path)}.", suffix=".tmp"
+            )
+            try:
+                with os.fdopen(fd, "w") as f:
+                    f.write(payload)
+                os.replace(tmp, self.path)
+            except BaseException:
+                os.remove(tmp)
+                raise
+
+    def summary(self) -> str:
+        s = self.stats
+        lookups = s["hits"] + s["stale"] + s["misses"]
+        avoided = lookups - s["refreshed"] - s["errors"]
+        return (
+            f"{s['hits']} fresh, {s['stale']} stale, {s['misses']} missing; "
+            f"{s['refreshed']} info calls made, {max(avoided, 0)}/{lookups} avoided"
+        )
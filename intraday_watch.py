@@ -0,0 +1,267 @@
+"""
+Intraday watch mode: poll 1m/5m bars for the universe and indices during
+market hours and keep live statistics up to date incrementally.
+
+Each poll only applies bars newer than the last one seen per symbol:
+returns and volatility come from online (Welford) accumulators, the
+gainer/loser ranking is a sorted list updated by bisection, and sector
+averages are running sums - so an update costs O(new bars), not
+O(history). A formatted snapshot is pushed every `push_every` seconds.
+
+The latest bar Yahoo returns is still forming; it moves the live price
+but only enters the accumulators once a newer bar has started.
+"""
+import bisect
+import math
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+from data_collector import INDEX_SYMBOLS
+from metrics import METRICS
+from stock_universe import metadata as universe_metadata
+
+IST = timezone(timedelta(hours=5, minutes=30))
+MARKET_OPEN = (9, 15)
+MARKET_CLOSE = (15, 30)
+
+
+def ist_now():
+    """Naive datetime in IST, matching the naive bar timestamps"""
+    return datetime.now(IST).replace(tzinfo=None)
+
+
+class SimulatedClock:
+    """Clock whose sleep() just advances time, for replaying a session offline"""
+
+    def __init__(self, start: datetime):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.now += timedelta(seconds=seconds)
+
+
+class RunningStats:
+    """Welford's online mean / variance"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, x: float):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else float("nan")
+
+
+class SymbolState:
+    def __init__(self, symbol: str, prev_close: float):
+        self.symbol = symbol
+        self.prev_close = prev_close
+        self.last_ts = None      # last completed bar folded into the stats
+        self.last_close = None
+        self.price = None        # live price, includes the forming bar
+        self.volume = 0.0
+        self.returns = RunningStats()
+
+    @property
+    def change_pct(self) -> float:
+        return (self.price - self.prev_close) / self.prev_close * 100
+
+
+def _naive_ist(index):
+    if getattr(index, "tz", None) is not None:
+        return index.tz_convert(IST).tz_localize(None)
+    return index
+
+
+class IntradayWatch:
+    def __init__(self, collector, symbols=None, interval: str = "5m",
+                 clock=None, sleep=None, top: int = 10):
+        self.collector = collector
+        self.symbols = list(symbols if symbols is not None else collector.stocks)
+        self.interval = interval
+        self.clock = clock or ist_now
+        self.sleep = sleep or time.sleep
+        self.top = top
+        self.states = {}
+        self.ranking = []        # sorted [(change_pct, symbol)]
+        self.sector_sum = {}
+        self.sector_count = {}
+        self.polls = 0
+        self.bars_applied = 0
+
+    def _all_symbols(self):
+        return self.symbols + list(INDEX_SYMBOLS.values())
+
+    def start(self):
+        """Previous session closes, the reference for the day's changes"""
+        today = pd.Timestamp(self.clock().date())
+        daily = self.collector.download_histories(self._all_symbols(), days=10)
+        for sym, hist in daily.items():
+            closes = hist["Close"].dropna()
+            closes = closes.loc[closes.index < today]
+            if len(closes):
+                self.states[sym] = SymbolState(sym, float(closes.iloc[-1]))
+        print(f"Watch: {len(self.states)} symbols with a previous close")
+
+    def _set_change(self, state, price: float):
+        if state.symbol in INDEX_SYMBOLS.values():
+            state.price = price
+            return
+        counted = state.price is not None
+        if counted:
+            old = state.change_pct
+            del self.ranking[bisect.bisect_left(self.ranking, (old, state.symbol))]
+            self._sector_add(state.symbol, -old, 0)
+        state.price = price
+        bisect.insort(self.ranking, (state.change_pct, state.symbol))
+        self._sector_add(state.symbol, state.change_pct, 0 if counted else 1)
+
+    def _sector_add(self, symbol: str, value: float, count: int):
+        sector = universe_metadata(symbol).get("sector", "N/A")
+        self.sector_sum[sector] = self.sector_sum.get(sector, 0.0) + value
+        self.sector_count[sector] = self.sector_count.get(sector, 0) + count
+
+    def apply(self, symbol: str, frame):
+        """Fold the bars of `frame` newer than the last seen one into the state"""
+        state = self.states.get(symbol)
+        if state is None or frame is None or frame.empty:
+            return 0
+        index = frame.index
+        start = 0
+        if state.last_ts is not None:
+            # compare in the frame's own zone; only the new bars get converted
+            last = pd.Timestamp(state.last_ts)
+            if getattr(index, "tz", None) is not None:
+                last = last.tz_localize(IST)
+            start = index.searchsorted(last, side="right")
+        if start >= len(index):
+            return 0
+
+        closes = frame["Close"].to_numpy(dtype=float)[start:]
+        volumes = frame["Volume"].to_numpy(dtype=float)[start:]
+        # everything but the last bar is complete
+        for close, volume in zip(closes[:-1], volumes[:-1]):
+            if math.isnan(close):
+                continue
+            if state.last_close is not None:
+                state.returns.add((close - state.last_close) / state.last_close * 100)
+            state.last_close = close
+            state.volume += volume
+        if len(closes) > 1:
+            state.last_ts = _naive_ist(index[-2:-1])[0]
+        if not math.isnan(closes[-1]):
+            self._set_change(state, float(closes[-1]))
+        return len(closes) - 1
+
+    def _poll_starts(self):
+        """
+        {start: symbols} to download: each symbol from its own last-seen bar
+        (bucketed to the interval, so the universe shares a few starts and a
+        stalled name does not hold the others back), symbols with nothing
+        applied yet from today's open. A download grows with the new bars,
+        not with the session.
+        """
+        today = pd.Timestamp(self.clock().date())
+        step = pd.Timedelta(self.interval)
+        groups = {}
+        for state in self.states.values():
+            since = today if state.last_ts is None else max(state.last_ts.floor(step), today)
+            groups.setdefault(since, []).append(state.symbol)
+        return groups
+
+    def poll(self):
+        """Fetch the bars since the last poll and apply the new ones; returns bars applied"""
+        start = time.perf_counter()
+        frames = {}
+        for since, symbols in self._poll_starts().items():
+            frames.update(self.collector.download_histories(
+                symbols, start=since.to_pydatetime(), interval=self.interval
+            ))
+        applied = sum(self.apply(sym, frame) for sym, frame in frames.items())
+        self.polls += 1
+        self.bars_applied += applied
+        METRICS.observe("watch.poll_s", time.perf_counter() - start)
+        METRICS.incr("watch.bars", applied)
+        return applied
+
+    def snapshot(self):
+        stocks = [s for s in self.states.values()
+                  if s.price is not None and s.symbol not in INDEX_SYMBOLS.values()]
+        indices = {
+            name: self.states[sym] for name, sym in INDEX_SYMBOLS.items()
+            if sym in self.states and self.states[sym].price is not None
+        }
+        sectors = {
+            sector: self.sector_sum[sector] / count
+            for sector, count in self.sector_count.items() if count
+        }
+        return {
+            "time": self.clock(),
+            "indices": {
+                name: {"price": s.price, "change_pct": s.change_pct}
+                for name, s in indices.items()
+            },
+            "gainers": [self.states[sym] for _, sym in reversed(self.ranking[-self.top:])],
+            "losers": [self.states[sym] for _, sym in self.ranking[:self.top]],
+            "sectors": sorted(sectors.items(), key=lambda kv: -kv[1]),
+            "tracked": len(stocks),
+        }
+
+    def run(self, poll_every: float = 60, push_every: float = 900, on_snapshot=print):
+        """Poll until the market closes, pushing a snapshot every `push_every` seconds"""
+        self.start()
+        next_push = None
+        while True:
+            now = self.clock()
+            if now.weekday() >= 5 or (now.hour, now.minute) >= MARKET_CLOSE:
+                break
+            if (now.hour, now.minute) < MARKET_OPEN:
+                opens = now.replace(hour=MARKET_OPEN[0], minute=MARKET_OPEN[1], second=0)
+                self.sleep((opens - now).total_seconds())
+                continue
+
+            applied = self.poll()
+            print(f"[{now:%H:%M}] poll {self.polls}: {applied} new bars")
+            if next_push is None or now >= next_push:
+                on_snapshot(format_snapshot(self.snapshot()))
+                next_push = now + timedelta(seconds=push_every)
+            self.sleep(poll_every)
+
+        if self.polls:
+            on_snapshot(format_snapshot(self.snapshot(), title="CLOSING SNAPSHOT"))
+
+
+def format_snapshot(snap, title: str = "INTRADAY SNAPSHOT") -> str:
+    lines = [f"{title} {snap['time']:%H:%M} IST ({snap['tracked']} stocks)"]
+    for name, idx in snap["indices"].items():
+        lines.append(f"{name.upper()}: {idx['price']:.2f} ({idx['change_pct']:+.2f}%)")
+
+    def block(heading, states):
+        lines.append(heading)
+        for s in states:
+            vol = s.returns.std
+            vol = f"{vol:.2f}%" if not np.isnan(vol) else "n/a"
+            lines.append(
+                f"  {s.symbol.replace('.NS', ''):12} Rs{s.price:>9.2f} "
+                f"{s.change_pct:+6.2f}%  bar vol {vol}"
+            )
+
+    block("Top gainers:", snap["gainers"])
+    block("Top losers:", snap["losers"])
+    lines.append("Sectors:")
+    for sector, avg in snap["sectors"]:
+        lines.append(f"  {sector:24} {avg:+.2f}%")
+    return "\n".join(lines)
@@ -1,87 +1,439 @@
+import argparse
+import functools
 import os
-from datetime import datetime
-import requests
-
-from data_collector import StockDataCollector
-from analyzer import MarketAnalyzer
-from report_generator import create_pdf
-
-def send_telegram_message(text: str):
-    token = os.getenv("TELEGRAM_BOT_TOKEN")
-    chat_id = os.getenv("TELEGRAM_CHAT_ID")
-    if not token or not chat_id:
-        print("Telegram credentials missing")
-        return
-    url = f"https://api.telegram.org/bot{token}/sendMessage"
+import subprocess
+import sys
+from datetime import datetime, timedelta
+
+# Only standard-library modules at import; pandas / yfinance / bs4 / fpdf are
+# imported by the stage that needs them, so --help and small runs start fast
+from pipeline import Stage, run_stages
+from metrics import METRICS, DEFAULT_METRICS_DIR, RunProfiler
+from fundamentals_cache import FundamentalsCache, refresh_budget
+from fetch_journal import FetchJournal
+from sharding import (
+    DEFAULT_SHARD_DIR, find_shards, merge_shards, parse_shard, shard_path,
+    shard_symbols, write_shard,
+)
+from stock_universe import add_selection_args
+from telegram_delivery import TelegramDelivery
+from report_profiles import (
+    DEFAULT_PROFILES_FILE, SELECTION_KEYS, build_report, default_profile, load_profiles,
+    union_symbols,
+)
+
+# how long a run waits at exit for the background fundamentals refresh
+FUNDAMENTALS_WAIT_S = 120
+
+OFFLINE_NEWS = [
+    "Offline mode: stub headline about benchmark indices closing the week higher",
+    "Offline mode: stub headline about banking stocks leading the sector rally",
+    "Offline mode: stub headline about FIIs turning net buyers in cash market",
+]
+
+
+def build_stages(collector, profiles, news_source=None, market_source=None,
+                 pdf_paths=None, executor=None, cache_dir=None):
+    """
+    Report pipeline as a stage graph. Market data (universe + indices, one
+    batched download, or merged shard files) and news are independent I/O
+    and run in parallel. The stock table of every profile's symbols is built
+    once, and so is the correlation / sector-rotation pass over it (cached
+    per day in `cache_dir`). Then one "report.<profile>" stage per profile
+    analyses its subset and yields the PDF bytes (also written to
+    pdf_paths[name] if set). The report stages run concurrently, in
+    `executor`'s processes when given.
+    """
+    def market():
+        return market_source() if market_source else collector.get_all_data_batched()
+
+    def news():
+        return news_source() if news_source else collector.scrape_market_news()
+
+    def stocks(market):
+        from stock_table import build_stock_table
+
+        _, all_data = market
+        # small subset runs (one sector, a few symbols) need at least half of them
+        if len(all_data) < min(20, max(len(collector.stocks) // 2, 1)):
+            raise RuntimeError(f"Only {len(all_data)} stocks fetched")
+        return build_stock_table(all_data)
+
+    def structure(stocks):
+        from market_structure import build_market_structure
+
+        return build_market_structure(collector.closes, stocks, cache_dir=cache_dir)
+
+    def report(profile, market, stocks, news, structure):
+        indices, _ = market
+        job = (profile, indices, stocks, news, (pdf_paths or {}).get(profile.name), structure)
+        if executor is not None:
+            return executor.submit(build_report, *job).result()
+        return build_report(*job)
+
+    stages = [
+        Stage("market", market, timeout=1800),
+        Stage("news", news, timeout=45, optional=True, default=[]),
+        Stage("stocks", stocks, deps=["market"]),
+        Stage("structure", structure, deps=["stocks"], timeout=120, optional=True),
+    ]
+    for profile in profiles:
+        stages.append(Stage(
+            f"report.{profile.name}", functools.partial(report, profile),
+            deps=["market", "stocks", "news", "structure"], timeout=240,
+        ))
+    return stages
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Daily Indian stock market report")
+    parser.add_argument(
+        "--offline", action="store_true",
+        help="dry run: synthetic prices, stub news, in-memory store, no Telegram",
+    )
+    parser.add_argument(
+        "--profile", action="store_true",
+        help="capture a cProfile dump of the run next to the metrics JSON",
+    )
+    parser.add_argument(
+        "--metrics-dir", default=DEFAULT_METRICS_DIR,
+        help="where the per-run metrics JSON is written",
+    )
+    parser.add_argument(
+        "--no-resume", action="store_true",
+        help="ignore today's fetch journal and collect every symbol again",
+    )
+    parser.add_argument(
+        "--shard", metavar="I/N",
+        help="only collect shard I of N (0-based) and write it to --shard-dir; no report",
+    )
+    parser.add_argument(
+        "--shards", type=int, metavar="N",
+        help="collect N shards in parallel processes, then merge and report",
+    )
+    parser.add_argument(
+        "--merge", action="store_true",
+        help="build the report from the shard files in --shard-dir instead of fetching",
+    )
+    parser.add_argument("--shard-dir", default=DEFAULT_SHARD_DIR)
+    parser.add_argument(
+        "--report-profiles", nargs="?", const=DEFAULT_PROFILES_FILE, metavar="FILE",
+        help="one report per profile in FILE (default data/profiles.json), "
+             "from a single collection of all their symbols",
+    )
+    parser.add_argument("--only", nargs="+", metavar="NAME", help="only these profiles")
+    parser.add_argument(
+        "--screens", metavar="FILE",
+        help="screen definitions (JSON list, see screens.py) instead of the built-in "
+             "ones; a profile's own \"screens\" file takes precedence",
+    )
+    parser.add_argument(
+        "--save-pdf", metavar="DIR",
+        help="also archive the PDF in DIR (offline runs write it to the current directory)",
+    )
+    add_selection_args(parser)
+    parser.add_argument(
+        "--watch", action="store_true",
+        help="intraday watch mode: poll bars until the close and push snapshots",
+    )
+    parser.add_argument("--interval", default="5m", choices=["1m", "2m", "5m", "15m"])
+    parser.add_argument("--poll-every", type=float, default=60, help="seconds between polls")
+    parser.add_argument(
+        "--push-every", type=float, default=900, help="seconds between pushed snapshots"
+    )
+    parser.add_argument(
+        "--delivery-timeout", type=float, default=120,
+        help="seconds to wait at shutdown for queued Telegram messages",
+    )
+    args = parser.parse_args(argv)
+    if args.report_profiles and any(getattr(args, k) is not None for k in SELECTION_KEYS):
+        parser.error("--index/--sector/--max-tier/--symbols are set per profile "
+                     "with --report-profiles")
+    if args.only and not args.report_profiles:
+        parser.error("--only needs --report-profiles")
     try:
-        requests.post(url, data={"chat_id": chat_id, "text": text}, timeout=10)
-    except Exception as e:
-        print(f"Telegram error: {e}")
-
-def send_telegram_pdf(path: str):
-    token = os.getenv("TELEGRAM_BOT_TOKEN")
-    chat_id = os.getenv("TELEGRAM_CHAT_ID")
-    if not token or not chat_id:
-        print("Telegram credentials missing")
-        return
-    url = f"https://api.telegram.org/bot{token}/sendDocument"
+        shard = parse_shard(args.shard) if args.shard else None
+    except ValueError as e:
+        parser.error(str(e))
+    # shard processes finish together; keep their artifacts apart
+    tag = f"_shard{shard[0]}of{shard[1]}" if shard else ""
+
+    METRICS.reset()
+    # messages are queued and sent in the background; flushed at shutdown
+    delivery = None if args.offline or args.shard else TelegramDelivery.from_env()
+    profiler = RunProfiler() if args.profile else None
+    if profiler:
+        profiler.start()
     try:
-        with open(path, "rb") as f:
-            files = {"document": f}
-            caption = (
-                f"DAILY STOCK REPORT\n"
-                f"{datetime.now().strftime('%d %B %Y')}\n\n"
-                f"Intraday Analysis + Medium-Risk Stocks"
+        run(args, delivery)
+    finally:
+        if delivery:
+            with METRICS.stage("deliver"):
+                delivery.close(timeout=args.delivery_timeout)
+        if profiler:
+            path = os.path.join(
+                args.metrics_dir, f"profile_{datetime.now().strftime('%Y%m%d_%H%M%S')}{tag}.prof"
             )
-            data = {"chat_id": chat_id, "caption": caption}
-            r = requests.post(url, data=data, files=files, timeout=30)
-            print(f"PDF sent: {r.status_code}")
-    except Exception as e:
-        print(f"PDF error: {e}")
+            print(profiler.stop(path))
+            print(f"Profile written to {path}")
+        print("\n" + METRICS.summary())
+        print(f"Metrics written to {METRICS.write(args.metrics_dir, tag)}")
+
+
+def collect_shard(collector, index: int, count: int, directory: str):
+    """Collect one shard of the universe and write its intermediate file"""
+    from market_structure import closes_to_json
+
+    universe = len(collector.stocks)
+    collector.stocks = shard_symbols(collector.stocks, index, count)
+    print(f"Shard {index}/{count}: {len(collector.stocks)} of {universe} symbols")
+    with METRICS.stage("shard.collect"):
+        indices, data = collector.get_all_data_batched()
+    mine = set(collector.stocks)
+    skips = {sym: reason for sym, reason in METRICS.skip_reasons.items() if sym in mine}
+    path = write_shard(
+        shard_path(index, count, directory), index, count,
+        collector.stocks, indices, data, skips,
+        closes=closes_to_json(collector.closes) if collector.closes is not None else None,
+    )
+    print(f"Shard written to {path}")
+
+
+def spawn_shards(args):
+    """Run `--shard i/N` for every shard as child processes and wait for them"""
+    for old in find_shards(args.shard_dir):
+        os.remove(old)
+    cmd = [sys.executable, os.path.abspath(__file__), "--metrics-dir", args.metrics_dir]
+    if args.offline:
+        cmd.append("--offline")
+    if args.no_resume:
+        cmd.append("--no-resume")
+    for flag in ("index", "sector", "max_tier"):
+        if getattr(args, flag) is not None:
+            cmd += [f"--{flag.replace('_', '-')}", str(getattr(args, flag))]
+    if args.symbols:
+        cmd += ["--symbols"] + args.symbols
+    if args.report_profiles:
+        cmd += ["--report-profiles", args.report_profiles]
+    if args.only:
+        cmd += ["--only"] + args.only
+    procs = [
+        subprocess.Popen(cmd + ["--shard", f"{i}/{args.shards}", "--shard-dir", args.shard_dir])
+        for i in range(args.shards)
+    ]
+    failed = [i for i, p in enumerate(procs) if p.wait() != 0]
+    if failed:
+        print(f"Shard process(es) failed: {failed}")
+
+
+def load_merged_shards(collector, directory: str):
+    from market_structure import closes_from_json
+
+    indices, data, skips, closes = merge_shards(find_shards(directory), collector.stocks)
+    collector.closes = closes_from_json(closes)
+    for sym, reason in skips.items():
+        METRICS.skip(sym, reason)
+    print(f"Merged shards: {len(data)} stocks, {len(skips)} skipped")
+    return indices, data
+
+
+def watch(args, stocks, notify=print):
+    """Intraday watch: incremental stats over 1m/5m bars, snapshots pushed periodically"""
+    from data_collector import StockDataCollector
+    from fetch_engine import FetchEngine
+    from intraday_watch import IntradayWatch, SimulatedClock, ist_now
+    from price_sources import SyntheticPriceSource
+
+    if args.offline:
+        # replay the latest weekday's synthetic session without waiting
+        day = ist_now()
+        while day.weekday() >= 5:
+            day -= timedelta(days=1)
+        clock = SimulatedClock(datetime(day.year, day.month, day.day, 9, 10))
+        collector = StockDataCollector(
+            source=SyntheticPriceSource(clock=clock), engine=FetchEngine(rate=1000),
+            stocks=stocks,
+        )
+        watcher = IntradayWatch(collector, interval=args.interval, clock=clock, sleep=clock.sleep)
+    else:
+        collector = StockDataCollector(stocks=stocks)
+        watcher = IntradayWatch(collector, interval=args.interval)
+
+    with METRICS.stage("watch"):
+        watcher.run(
+            poll_every=args.poll_every, push_every=args.push_every, on_snapshot=notify
+        )
+    print(f"Watch finished: {watcher.polls} polls, {watcher.bars_applied} bars applied")
+
+
+def report_executor(profiles):
+    """Worker processes for the per-profile report stages; None for a single report"""
+    workers = min(len(profiles), os.cpu_count() or 1)
+    if workers < 2:
+        return None
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    # forkserver: workers must not fork this process while the pipeline's
+    # threads (fetch, fundamentals, Telegram) may hold locks
+    context = multiprocessing.get_context("forkserver")
+    context.set_forkserver_preload(["report_profiles", "analyzer", "report_generator"])
+    return ProcessPoolExecutor(workers, mp_context=context)
+
+
+def run(args, delivery=None):
+    from data_collector import StockDataCollector
+    from market_structure import DEFAULT_CACHE_DIR
+    from fetch_engine import FetchEngine
+    from price_sources import SyntheticPriceSource
+    from price_store import PriceStore
 
-def main():
     print("=" * 60)
     print("STOCK AGENT STARTED", datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
     print("=" * 60)
 
-    send_telegram_message("Starting daily stock report generation...")
-
-    collector = StockDataCollector()
+    screens = None
+    if args.screens:
+        from screens import load_screens
+        screens = load_screens(args.screens)
+    if args.report_profiles:
+        profiles = load_profiles(args.report_profiles, args.only, screens)
+        if delivery and not args.save_pdf:
+            unsent = [p.name for p in profiles if not p.recipients()]
+            if unsent:
+                print(f"Profiles without recipients, not built: {', '.join(unsent)}")
+            profiles = [p for p in profiles if p.recipients()]
+    else:
+        profiles = [default_profile(args, screens)]
 
-    print("\nStep 1: Fetching market indices...")
-    indices = collector.get_market_indices_real_only()
+    stocks = union_symbols(profiles)
+    if not stocks:
+        print("No symbols match the universe selection")
+        return
+    if len(profiles) > 1:
+        print(f"{len(profiles)} report profiles over {len(stocks)} symbols: "
+              f"{', '.join(p.name for p in profiles)}")
+    notify = delivery.send_message if delivery else print
+    if args.watch:
+        watch(args, stocks, notify)
+        return
+    shard = parse_shard(args.shard) if args.shard else None
+    notify("Starting daily stock report generation...")
 
-    print("\nStep 2: Fetching ALL stock data (real data only)...")
-    send_telegram_message("Fetching data for 150+ stocks. This may take 10-15 minutes...")
-    all_data = collector.get_all_stocks_real_data()
+    if args.offline:
+        collector = StockDataCollector(
+            source=SyntheticPriceSource(),
+            engine=FetchEngine(rate=1000),
+            store=PriceStore(":memory:"),
+            history_days=400,
+            stocks=stocks,
+        )
+        news_source = lambda: list(OFFLINE_NEWS)
+    else:
+        engine = FetchEngine()
+        collector = StockDataCollector(
+            engine=engine,
+            store=PriceStore(),
+            history_days=400,
+            fundamentals=FundamentalsCache(
+                max_refresh=refresh_budget(
+                    len(stocks), rate=engine.bucket.rate, seconds=FUNDAMENTALS_WAIT_S
+                ),
+                background=True,
+            ),
+            journal=FetchJournal(
+                resume=not args.no_resume,
+                tag=f".shard{shard[0]}of{shard[1]}" if shard else "",
+            ),
+            stocks=stocks,
+        )
+        news_source = None
 
-    if len(all_data) < 20:
-        msg = f"FAILED: Only {len(all_data)} stocks fetched. Aborting."
-        print(msg)
-        send_telegram_message(msg)
-        return
+    # background fundamentals refreshes are daemon threads: every way out of
+    # the run (shard, abort, done) waits for them so their results are saved
+    try:
+        if shard:
+            collect_shard(collector, shard[0], shard[1], args.shard_dir)
+            return
 
-    print(f"\nStep 3: Analyzing sectors...")
-    sector_perf = collector.sector_performance(all_data)
+        market_source = None
+        if args.shards:
+            notify(f"Collecting {len(collector.stocks)} stocks in {args.shards} shard processes...")
+            with METRICS.stage("shards"):
+                spawn_shards(args)
+        if args.shards or args.merge:
+            market_source = lambda: load_merged_shards(collector, args.shard_dir)
+        else:
+            notify(f"Fetching data for {len(collector.stocks)} stocks in batched mode...")
 
-    print("\nStep 4: Scraping news...")
-    news = collector.scrape_market_news()
+        from report_generator import report_filename
 
-    analyzer = MarketAnalyzer()
-    print("\nStep 5: Building intraday analysis...")
-    intraday = analyzer.analyze_intraday(indices, all_data, news, sector_perf)
+        filenames = {
+            p.name: report_filename(p.name if args.report_profiles else None) for p in profiles
+        }
+        archive_dir = args.save_pdf or ("." if args.offline else None)
+        pdf_paths = {
+            name: os.path.join(archive_dir, filename) for name, filename in filenames.items()
+        } if archive_dir else {}
+        if args.save_pdf:
+            os.makedirs(args.save_pdf, exist_ok=True)
 
-    print("\nStep 6: Building portfolio recommendations...")
-    portfolio = analyzer.recommend_medium_risk(all_data)
+        executor = report_executor(profiles)
+        try:
+            result = run_stages(
+                build_stages(
+                    collector, profiles, news_source, market_source, pdf_paths, executor,
+                    cache_dir=None if args.offline else DEFAULT_CACHE_DIR,
+                )
+            )
+        finally:
+            if executor is not None:
+                # a report worker past its stage timeout must not hold up delivery
+                executor.shutdown(wait=False, cancel_futures=True)
+        for name, seconds in result.timings.items():
+            METRICS.record_stage(name, seconds)
 
-    print("\nStep 7: Generating PDF...")
-    pdf_path = create_pdf(intraday, portfolio)
+        reports = [
+            (p, result.values[f"report.{p.name}"]) for p in profiles
+            if f"report.{p.name}" in result.values
+        ]
+        if not result.ok:
+            failed = ", ".join(f"{name}: {err}" for name, err in result.failed.items())
+            msg = f"FAILED: {failed}. " + (
+                f"Sending the other {len(reports)} report(s)." if reports else "Aborting."
+            )
+            print(msg)
+            notify(msg)
+            if not reports:
+                return
 
-    print("\nStep 8: Sending PDF via Telegram...")
-    send_telegram_pdf(pdf_path)
-    send_telegram_message(f"✅ Report complete! Analyzed {len(all_data)} verified stocks.")
+        METRICS.gauge("report.count", len(reports))
+        METRICS.gauge("report.pdf_bytes", sum(len(pdf) for _, pdf in reports))
+        for profile, pdf in reports:
+            if profile.name in pdf_paths:
+                print(f"\nPDF ({len(pdf) // 1024} KB) archived to {pdf_paths[profile.name]}")
+            if not delivery:
+                continue
+            n_stocks = len(profile.stock_table(result["stocks"]))
+            caption = (
+                f"DAILY STOCK REPORT\n"
+                f"{datetime.now().strftime('%d %B %Y')}\n\n"
+                f"{profile.title or 'Intraday Analysis + Medium-Risk Stocks'}"
+            )
+            recipients = profile.recipients()
+            print(f"Queueing {profile.name} PDF for {len(recipients)} Telegram chat(s)...")
+            for chat in recipients:
+                delivery.send_document(pdf, filenames[profile.name], caption=caption, chat_id=chat)
+                delivery.send_message(
+                    f"✅ Report complete! Analyzed {n_stocks} verified stocks.", chat_id=chat
+                )
+        if not delivery:
+            print("Offline run - PDF not sent")
 
-    print("\n✅ Done!")
+        print("\n✅ Done!")
+    finally:
+        if collector.fundamentals is not None:
+            collector.fundamentals.wait(timeout=FUNDAMENTALS_WAIT_S)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,187 @@
+"""
+Run instrumentation: wall time per stage, latency histograms (e.g. per-symbol
+download vs info), counters (retries, cache hits, ...), skip reasons and peak
+memory. Each run writes a JSON artifact and prints a short summary.
+
+METRICS is the process-wide registry every module records into.
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+DEFAULT_METRICS_DIR = "metrics"
+
+
+def percentile(sorted_values, q: float):
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, max(0, int(round(q / 100 * (len(sorted_values) - 1)))))
+    return sorted_values[idx]
+
+
+def peak_memory_mb() -> float:
+    """Peak resident set size of this process (0 where unavailable)"""
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class RunMetrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.started = time.time()
+            self.stages = {}
+            self.histograms = {}
+            self.counters = Counter()
+            self.skip_reasons = {}
+            self.gauges = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_stage(name, time.perf_counter() - start)
+
+    def record_stage(self, name: str, seconds: float):
+        with self.lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def observe(self, name: str, value: float):
+        with self.lock:
+            self.histograms.setdefault(name, []).append(value)
+
+    @contextmanager
+    def timer(self, name: str):
+        """Record the block's duration into histogram `name` (seconds)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def incr(self, name: str, n: int = 1):
+        with self.lock:
+            self.counters[name] += n
+
+    def gauge(self, name: str, value):
+        with self.lock:
+            self.gauges[name] = value
+
+    def skip(self, symbol: str, reason: str):
+        with self.lock:
+            self.skip_reasons[symbol] = reason
+
+    def histogram_summary(self, values):
+        values = sorted(values)
+        return {
+            "count": len(values),
+            "mean": sum(values) / len(values) if values else 0.0,
+            "p50": percentile(values, 50),
+            "p90": percentile(values, 90),
+            "p99": percentile(values, 99),
+            "max": values[-1] if values else 0.0,
+        }
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                "started": datetime.fromtimestamp(self.started).isoformat(timespec="seconds"),
+                "wall_time_s": round(time.time() - self.started, 3),
+                "peak_memory_mb": round(peak_memory_mb(), 1),
+                "stages_s": {k: round(v, 4) for k, v in self.stages.items()},
+                "latency_s": {
+                    name: {k: round(v, 4) for k, v in self.histogram_summary(vals).items()}
+                    for name, vals in self.histograms.items()
+                },
+                "counters": dict(self.counters),
+                "gauges": dict(self.gauges),
+                "skip_reasons": dict(Counter(self.skip_reasons.values())),
+                "skipped_symbols": dict(self.skip_reasons),
+            }
+
+    def write(self, directory: str = DEFAULT_METRICS_DIR, tag: str = ""):
+        """
+        Write the JSON artifact; returns its path. `tag` keeps processes that
+        finish in the same second (shards) from overwriting each other.
+        """
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(
+            directory, f"run_{datetime.now().strftime('%Y%m%d_%H%M%S')}{tag}.json"
+        )
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        return path
+
+    def summary(self) -> str:
+        d = self.to_dict()
+        lines = [f"Run: {d['wall_time_s']:.1f}s wall, peak memory {d['peak_memory_mb']:.0f} MB"]
+        for name, secs in sorted(d["stages_s"].items(), key=lambda kv: -kv[1]):
+            lines.append(f"  stage {name:24} {secs:8.2f}s")
+        for name, h in d["latency_s"].items():
+            lines.append(
+                f"  {name:30} n={h['count']:<5} p50={h['p50'] * 1000:.0f}ms "
+                f"p90={h['p90'] * 1000:.0f}ms max={h['max'] * 1000:.0f}ms"
+            )
+        if d["counters"]:
+            lines.append("  " + ", ".join(f"{k}={v}" for k, v in sorted(d["counters"].items())))
+        if d["skip_reasons"]:
+            lines.append("  skips: " + ", ".join(f"{k}={v}" for k, v in d["skip_reasons"].items()))
+        return "\n".join(lines)
+
+
+class RunProfiler:
+    """cProfile for the main thread plus every thread started while active"""
+
+    def __init__(self):
+        self.profilers = []
+        self.lock = threading.Lock()
+        self.main = cProfile.Profile()
+
+    def _start_thread(self, frame, event, arg):
+        profiler = cProfile.Profile()
+        with self.lock:
+            self.profilers.append(profiler)
+        profiler.enable()
+
+    def start(self):
+        threading.setprofile(self._start_thread)
+        self.main.enable()
+
+    def stop(self, path: str, top: int = 20) -> str:
+        """Dump merged stats to `path`; returns the top functions as text"""
+        self.main.disable()
+        threading.setprofile(None)
+        stats = pstats.Stats(self.main)
+        for profiler in self.profilers:
+            stats.add(profiler)
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        stats.dump_stats(path)
+        out = io.StringIO()
+        stats.stream = out
+        stats.sort_stats("cumulative").print_stats(top)
+        return out.getvalue()
+
+
+METRICS = RunMetrics()
@@ -0,0 +1,137 @@
+"""
+Async market-news scraper.
+
+All sources are fetched concurrently over one pooled aiohttp session, so
+adding sources does not add wall-clock time. Responses are revalidated with
+ETag / Last-Modified against a small local cache (a 304 reuses the cached
+headlines), only h2/h3 elements are parsed (SoupStrainer), and per-source
+latency and failure stats are kept for reporting.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+
+import aiohttp
+from bs4 import BeautifulSoup, SoupStrainer
+
+from metrics import METRICS
+
+DEFAULT_NEWS_CACHE = os.path.join("cache", "news_http.json")
+
+NEWS_SOURCES = [
+    {"name": "economictimes", "url": "https://economictimes.indiatimes.com/markets/stocks/news"},
+    {"name": "moneycontrol", "url": "https://www.moneycontrol.com/news/business/markets/"},
+]
+
+HEADLINE_TAGS = ["h2", "h3"]
+
+
+def parse_headlines(html: str, limit: int = 10):
+    """Headline texts from the first `limit` h2/h3 tags; other markup is never built"""
+    soup = BeautifulSoup(html, "lxml", parse_only=SoupStrainer(HEADLINE_TAGS))
+    headlines = []
+    for h in soup.find_all(HEADLINE_TAGS, limit=limit):
+        text = h.get_text(strip=True)
+        if text and len(text) > 20:
+            headlines.append(text)
+    return headlines
+
+
+class NewsScraper:
+    def __init__(self, sources=None, cache_path: str = DEFAULT_NEWS_CACHE,
+                 headers=None, timeout: float = 10, max_connections: int = 10):
+        self.sources = sources or NEWS_SOURCES
+        self.cache_path = cache_path
+        self.headers = headers or {}
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.cache = {}
+        self.stats = {}
+        self.lock = threading.Lock()
+        if cache_path and os.path.exists(cache_path):
+            try:
+                with open(cache_path) as f:
+                    self.cache = json.load(f)
+            except (OSError, ValueError):
+                self.cache = {}
+
+    def _record(self, name: str, latency: float, outcome: str):
+        METRICS.observe("news.fetch_s", latency)
+        METRICS.incr(f"news.{outcome}")
+        with self.lock:
+            s = self.stats.setdefault(
+                name, {"requests": 0, "failures": 0, "not_modified": 0, "latency_ms": []}
+            )
+            s["requests"] += 1
+            s["latency_ms"].append(round(latency * 1000, 1))
+            if outcome == "failed":
+                s["failures"] += 1
+            elif outcome == "not_modified":
+                s["not_modified"] += 1
+
+    async def _fetch(self, session, source, limit: int):
+        url = source["url"]
+        cached = self.cache.get(url, {})
+        headers = dict(self.headers)
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+        start = time.monotonic()
+        try:
+            async with session.get(url, headers=headers) as r:
+                if r.status == 304 and "headlines" in cached:
+                    self._record(source["name"], time.monotonic() - start, "not_modified")
+                    return cached["headlines"]
+                r.raise_for_status()
+                html = await r.text()
+                etag = r.headers.get("ETag")
+                last_modified = r.headers.get("Last-Modified")
+            headlines = parse_headlines(html, limit)
+        except Exception as e:
+            # one bad source (network, bad encoding, parser) must not cost the others
+            self._record(source["name"], time.monotonic() - start, "failed")
+            print(f"News source {source['name']} failed: {type(e).__name__} {e}")
+            return cached.get("headlines", [])
+
+        self._record(source["name"], time.monotonic() - start, "ok")
+        if etag or last_modified:
+            self.cache[url] = {
+                "etag": etag, "last_modified": last_modified, "headlines": headlines
+            }
+        return headlines
+
+    async def scrape_async(self, limit: int = 10):
+        connector = aiohttp.TCPConnector(limit=self.max_connections)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            results = await asyncio.gather(
+                *(self._fetch(session, src, limit) for src in self.sources)
+            )
+        self.save()
+        news = [h for headlines in results for h in headlines]
+        return list(dict.fromkeys(news))[:limit]
+
+    def scrape(self, limit: int = 10):
+        return asyncio.run(self.scrape_async(limit))
+
+    def save(self):
+        if not self.cache_path:
+            return
+        if os.path.dirname(self.cache_path):
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        with open(self.cache_path, "w") as f:
+            json.dump(self.cache, f)
+
+    def summary(self) -> str:
+        parts = []
+        for name, s in self.stats.items():
+            worst = max(s["latency_ms"]) if s["latency_ms"] else 0
+            parts.append(
+                f"{name}: {s['requests']} req, {s['failures']} failed, "
+                f"{s['not_modified']} not modified, {worst:.0f}ms"
+            )
+        return "; ".join(parts)
@@ -0,0 +1,112 @@
+"""
+Tiny dependency-graph runner for the daily report.
+
+Each Stage names the stages it depends on; a stage starts as soon as all of
+its inputs are ready, independent stages run in parallel threads, and every
+stage has its own timeout. Optional stages fall back to a default value on
+error/timeout; a failed required stage skips everything that depends on it.
+"""
+import queue
+import threading
+import time
+
+
+class Stage:
+    def __init__(self, name: str, func, deps=(), timeout: float = None,
+                 optional: bool = False, default=None):
+        self.name = name
+        self.func = func
+        self.deps = list(deps)
+        self.timeout = timeout
+        self.optional = optional
+        self.default = default
+
+
+class PipelineResult:
+    def __init__(self):
+        self.values = {}
+        self.failed = {}
+        self.skipped = []
+        self.timings = {}
+
+    def __getitem__(self, name):
+        return self.values[name]
+
+    @property
+    def ok(self) -> bool:
+        return not self.failed and not self.skipped
+
+
+def run_stages(stages, log=print):
+    """
+    Run `stages` respecting dependencies. Each stage's func is called with
+    its dependencies' results as keyword arguments (by stage name).
+    """
+    by_name = {s.name: s for s in stages}
+    for s in stages:
+        missing = [d for d in s.deps if d not in by_name]
+        if missing:
+            raise ValueError(f"Stage {s.name} depends on unknown stage(s): {missing}")
+
+    result = PipelineResult()
+    pending = list(stages)
+    running = {}
+    done = queue.Queue()
+
+    def worker(stage, kwargs):
+        try:
+            value, error = stage.func(**kwargs), None
+        except Exception as e:
+            value, error = None, e
+        done.put((stage.name, value, error))
+
+    def finish(stage, value, error):
+        elapsed = time.monotonic() - running.pop(stage.name)[0]
+        result.timings[stage.name] = elapsed
+        if error is None:
+            result.values[stage.name] = value
+            log(f"    [stage] {stage.name} done in {elapsed:.1f}s")
+        elif stage.optional:
+            result.values[stage.name] = stage.default
+            log(f"    [stage] {stage.name} failed ({error}) - using default")
+        else:
+            result.failed[stage.name] = error
+            log(f"    [stage] {stage.name} FAILED after {elapsed:.1f}s: {error}")
+
+    while pending or running:
+        for stage in list(pending):
+            if any(d in result.failed or d in result.skipped for d in stage.deps):
+                pending.remove(stage)
+                result.skipped.append(stage.name)
+                log(f"    [stage] {stage.name} skipped (input failed)")
+            elif all(d in result.values for d in stage.deps):
+                pending.remove(stage)
+                kwargs = {d: result.values[d] for d in stage.deps}
+                thread = threading.Thread(
+                    target=worker, args=(stage, kwargs), name=f"stage-{stage.name}", daemon=True
+                )
+                deadline = time.monotonic() + stage.timeout if stage.timeout else None
+                running[stage.name] = (time.monotonic(), deadline)
+                thread.start()
+
+        if not running:
+            if pending:
+                raise ValueError(f"Dependency cycle among stages: {[s.name for s in pending]}")
+            continue
+
+        deadlines = [d for _, d in running.values() if d is not None]
+        wait = max(min(deadlines) - time.monotonic(), 0) if deadlines else None
+        try:
+            name, value, error = done.get(timeout=wait)
+        except queue.Empty:
+            now = time.monotonic()
+            for name, (_, deadline) in list(running.items()):
+                if deadline is not None and now >= deadline:
+                    stage = by_name[name]
+                    finish(stage, None, TimeoutError(f"timed out after {stage.timeout}s"))
+            continue
+
+        if name in running:
+            finish(by_name[name], value, error)
+
+    return result
@@ -0,0 +1,84 @@
+"""
+Vectorized price analytics for the whole universe at once.
+
+Per-symbol histories are aligned into one date x symbol matrix (with ^NSEI
+as the benchmark column) and beta, realized volatility, returns and 52-week
+extremes are computed with a handful of array operations instead of being
+read from ticker.info one symbol at a time.
+"""
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+BENCHMARK = "^NSEI"
+
+
+def build_price_matrix(histories, field: str = "Close"):
+    """Align {symbol: OHLCV DataFrame} into a date x symbol matrix of `field`"""
+    columns = {sym: df[field] for sym, df in histories.items() if field in df}
+    if not columns:
+        return pd.DataFrame()
+    return pd.DataFrame(columns).sort_index()
+
+
+def nan_beta(returns, market, min_periods: int = 60):
+    """
+    Column-wise beta of a T x N returns array against a length-T market
+    series, using only the dates where both are present.
+    """
+    mask = ~np.isnan(returns) & ~np.isnan(market)[:, None]
+    n = mask.sum(axis=0)
+    r = np.where(mask, returns, 0.0)
+    m = np.where(mask, market[:, None], 0.0)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        r_dev = np.where(mask, r - r.sum(axis=0) / n, 0.0)
+        m_dev = np.where(mask, m - m.sum(axis=0) / n, 0.0)
+        beta = (r_dev * m_dev).sum(axis=0) / (m_dev * m_dev).sum(axis=0)
+
+    beta[n < min_periods] = np.nan
+    return beta
+
+
+def compute_risk_metrics(histories, benchmark: str = BENCHMARK, window_days: int = 60,
+                         beta_days: int = 365, as_of=None):
+    """
+    Risk metrics per symbol, as a DataFrame indexed by symbol:
+        month_return, volatility  - over the last `window_days` (percent)
+        beta                      - daily returns vs `benchmark`, last `beta_days`
+        week52_high, week52_low   - intraday extremes over the last 365 days
+    Beta is NaN where there is not enough overlapping history.
+    """
+    closes = build_price_matrix(histories, "Close")
+    if closes.empty:
+        return pd.DataFrame()
+    highs = build_price_matrix(histories, "High").reindex_like(closes).fillna(closes)
+    lows = build_price_matrix(histories, "Low").reindex_like(closes).fillna(closes)
+
+    as_of = pd.Timestamp(as_of or datetime.now().date())
+    window = closes.loc[closes.index >= as_of - timedelta(days=window_days)]
+    year = closes.index >= as_of - timedelta(days=365)
+
+    first = window.bfill().iloc[0]
+    last = window.ffill().iloc[-1]
+    returns = window.pct_change(fill_method=None)
+
+    daily = closes.loc[closes.index >= as_of - timedelta(days=beta_days)]
+    daily = daily.pct_change(fill_method=None).to_numpy()
+    if benchmark in closes.columns:
+        market = daily[:, closes.columns.get_loc(benchmark)]
+        beta = nan_beta(daily, market)
+    else:
+        beta = np.full(len(closes.columns), np.nan)
+
+    return pd.DataFrame(
+        {
+            "month_return": (last / first - 1) * 100,
+            "volatility": returns.std() * 100,
+            "beta": beta,
+            "week52_high": highs.loc[year].max(),
+            "week52_low": lows.loc[year].min(),
+        },
+        index=closes.columns,
+    )
@@ -0,0 +1,321 @@
+"""
+Pluggable OHLCV / fundamentals sources for StockDataCollector.
+
+Every source exposes the same two calls:
+    download(symbols, start, end) -> {symbol: DataFrame[Open, High, Low, Close, Volume]}
+    info(symbol) -> dict of Yahoo-style ticker.info fields
+
+YahooPriceSource talks to Yahoo Finance, FixturePriceSource reads local files
+and SyntheticPriceSource generates data, so the pipeline can be exercised
+without network access. FaultInjectingSource wraps any of them with
+latency, errors and 429s.
+"""
+import json
+import os
+import random
+import threading
+import time
+import zlib
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from fetch_engine import ThrottledError, is_throttle_error
+
+_download_lock = threading.Lock()
+
+
+def split_batch_frame(raw, symbols):
+    """Split a multi-ticker yf.download frame into one frame per symbol"""
+    frames = {}
+    if raw is None or raw.empty:
+        return frames
+
+    if isinstance(raw.columns, pd.MultiIndex):
+        present = set(raw.columns.get_level_values(0))
+        for sym in symbols:
+            if sym not in present:
+                continue
+            df = raw[sym].dropna(how="all")
+            if not df.empty:
+                frames[sym] = df
+    elif len(symbols) == 1:
+        df = raw.dropna(how="all")
+        if not df.empty:
+            frames[symbols[0]] = df
+
+    return frames
+
+
+class YahooPriceSource:
+    """Yahoo Finance via yfinance, one multi-ticker request per call"""
+
+    def __init__(self, timeout: int = 30):
+        # imported here: yfinance is slow to import and only needed online
+        import yfinance
+        self.yf = yfinance
+        self.timeout = timeout
+
+    def download(self, symbols, start, end, interval: str = "1d"):
+        symbols = list(symbols)
+        if len(symbols) == 1:
+            return self._download_one(symbols[0], start, end, interval)
+
+        # yf.download keeps its results in module-level state, so concurrent
+        # calls would clobber each other; it already threads per ticker inside
+        with _download_lock:
+            raw = self.yf.download(
+                symbols, start=start, end=end, interval=interval,
+                group_by="ticker", threads=True, progress=False, timeout=self.timeout
+            )
+            errors = [err for sym, err in self.yf.shared._ERRORS.items() if sym in symbols]
+        frames = split_batch_frame(raw, symbols)
+
+        # yf.download logs per-ticker errors instead of raising; surface
+        # throttling and whole-request failures so the fetch engine can retry
+        if any(is_throttle_error(err) for err in errors):
+            raise ThrottledError(errors[0])
+        if not frames and errors:
+            raise RuntimeError(errors[0])
+
+        return frames
+
+    def _download_one(self, symbol, start, end, interval):
+        try:
+            hist = self.yf.Ticker(symbol).history(
+                start=start, end=end, interval=interval, auto_adjust=False,
+                actions=False, timeout=self.timeout, raise_errors=True
+            )
+        except Exception as e:
+            if is_throttle_error(e):
+                raise ThrottledError(str(e))
+            if "delisted" in str(e) or "No data found" in str(e):
+                return {}
+            raise
+        hist = hist.dropna(how="all")
+        if getattr(hist.index, "tz", None) is not None and interval == "1d":
+            hist.index = hist.index.tz_localize(None)
+        return {symbol: hist} if not hist.empty else {}
+
+    def info(self, symbol: str):
+        try:
+            return self.yf.Ticker(symbol).info or {}
+        except Exception as e:
+            if is_throttle_error(e):
+                raise ThrottledError(str(e))
+            raise
+
+
+class FixturePriceSource:
+    """
+    Local fixture provider that stands in for Yahoo.
+
+    Layout of `directory`:
+        <SYMBOL>.csv  - Date,Open,High,Low,Close,Volume (one file per symbol)
+        info.json     - {"<SYMBOL>": {...ticker.info fields...}}
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._info = None
+
+    def _path(self, symbol: str):
+        return os.path.join(self.directory, f"{symbol}.csv")
+
+    def download(self, symbols, start, end, interval: str = "1d"):
+        start = pd.Timestamp(start)
+        end = pd.Timestamp(end)
+        frames = {}
+        for sym in symbols:
+            path = self._path(sym)
+            if not os.path.exists(path):
+                continue
+            df = pd.read_csv(path, index_col=0, parse_dates=True)
+            df = df[(df.index >= start) & (df.index < end)]
+            if not df.empty:
+                frames[sym] = df
+        return frames
+
+    def info(self, symbol: str):
+        if self._info is None:
+            path = os.path.join(self.directory, "info.json")
+            if os.path.exists(path):
+                with open(path) as f:
+                    self._info = json.load(f)
+            else:
+                self._info = {}
+        return dict(self._info.get(symbol, {}))
+
+
+class SyntheticPriceSource:
+    """
+    Deterministic random-walk OHLCV and fundamentals for offline runs.
+    Every symbol is a one-factor model on a shared market walk, so beta and
+    correlations are meaningful; a given (symbol, date) always has the same
+    bar no matter which window is requested, so delta fetches line up.
+
+    Intraday intervals ("1m", "5m", ...) give a session of bars from 09:15
+    to 15:30 walking on from the previous daily close, cut at `clock()` so
+    polling sees bars appear as the (possibly simulated) day goes on.
+    """
+
+    EPOCH = pd.Timestamp("2018-01-01")
+    SECTORS = [
+        "Financial Services", "Technology", "Energy", "Consumer Defensive",
+        "Consumer Cyclical", "Healthcare", "Basic Materials", "Industrials",
+        "Utilities", "Communication Services", "Real Estate",
+    ]
+
+    SESSION_OPEN = pd.Timedelta(hours=9, minutes=15)
+    SESSION_MINUTES = 375
+
+    def __init__(self, seed: int = 0, clock=None):
+        self.seed = seed
+        self.clock = clock or datetime.now
+        self._market = None
+        self._calendar = {}
+        self._sessions = {}
+
+    def _rng(self, symbol: str, stream: int = 0, *extra):
+        # one generator per field, so each draw sequence is prefix-stable
+        return np.random.default_rng([self.seed, zlib.crc32(symbol.encode()), stream, *extra])
+
+    def _market_returns(self, n: int):
+        if self._market is None or len(self._market) < n:
+            rng = np.random.default_rng([self.seed, 0])
+            self._market = rng.normal(0.0004, 0.01, max(n, 4096))
+        return self._market[:n]
+
+    def _dates(self, end):
+        if end not in self._calendar:
+            self._calendar[end] = pd.bdate_range(self.EPOCH, end - pd.Timedelta(days=1))
+        return self._calendar[end]
+
+    def _params(self, symbol: str):
+        rng = self._rng(symbol)
+        if symbol.startswith("^"):
+            return rng, 1.0, 0.002, 10000.0 * (1 + rng.random())
+        return rng, rng.uniform(0.4, 1.8), rng.uniform(0.008, 0.03), rng.uniform(50, 5000)
+
+    def _session(self, symbol: str, day, interval: str):
+        """All bars of `day`'s session at `interval`; built once per (symbol, day)"""
+        key = (symbol, day, interval)
+        if key not in self._sessions:
+            step = int(interval.rstrip("m"))
+            n = self.SESSION_MINUTES // step
+            prev = self.download([symbol], day - pd.Timedelta(days=10), day).get(symbol)
+            base = float(prev["Close"].iloc[-1]) if prev is not None and len(prev) else 100.0
+            _, _, idio, _ = self._params(symbol)
+            rng = self._rng(symbol, 6, day.toordinal(), step)
+            close = base * np.exp(np.cumsum(rng.normal(0, idio / np.sqrt(n), n)))
+            opens = np.concatenate([[base], close[:-1]])
+            spread = np.abs(rng.normal(0, idio / np.sqrt(n) / 2, n))
+            self._sessions[key] = pd.DataFrame(
+                {
+                    "Open": opens,
+                    "High": np.maximum(opens, close) * (1 + spread),
+                    "Low": np.minimum(opens, close) * (1 - spread),
+                    "Close": close,
+                    "Volume": rng.integers(1_000, 200_000, n).astype(float),
+                },
+                index=pd.Index(
+                    day + self.SESSION_OPEN + pd.to_timedelta(np.arange(n) * step, unit="m"),
+                    name="Datetime",
+                ),
+            )
+        return self._sessions[key]
+
+    def _download_intraday(self, symbols, start, end, interval):
+        now = pd.Timestamp(self.clock())
+        days = [d for d in pd.bdate_range(start.normalize(), min(end, now)) if d < end]
+        frames = {}
+        for sym in symbols:
+            parts = [self._session(sym, day, interval) for day in days]
+            if parts:
+                # a bar is visible once it has started, like Yahoo's live bar
+                frame = pd.concat(parts)
+                frame = frame.loc[(frame.index >= start) & (frame.index <= now)]
+                if not frame.empty:
+                    frames[sym] = frame
+        return frames
+
+    def download(self, symbols, start, end, interval: str = "1d"):
+        start = pd.Timestamp(start)
+        end = pd.Timestamp(end)
+        if interval != "1d":
+            return self._download_intraday(symbols, start, end, interval)
+        dates = self._dates(end)
+        keep = dates >= start
+        if not keep.any():
+            return {}
+        market = self._market_returns(len(dates))
+
+        frames = {}
+        for sym in symbols:
+            _, beta, idio, price0 = self._params(sym)
+            n = len(dates)
+            rets = beta * market + self._rng(sym, 1).normal(0, idio, n)
+            close = price0 * np.exp(np.cumsum(rets))
+            high = close * (1 + np.abs(self._rng(sym, 2).normal(0, idio / 2, n)))
+            low = close * (1 - np.abs(self._rng(sym, 3).normal(0, idio / 2, n)))
+            frames[sym] = pd.DataFrame(
+                {
+                    "Open": low + (high - low) * self._rng(sym, 4).random(n),
+                    "High": high,
+                    "Low": low,
+                    "Close": close,
+                    "Volume": self._rng(sym, 5).integers(10_000, 5_000_000, n).astype(float),
+                },
+                index=pd.Index(dates, name="Date"),
+            ).loc[keep]
+        return frames
+
+    def info(self, symbol: str):
+        rng, beta, _, _ = self._params(symbol)
+        sector = self.SECTORS[zlib.crc32(symbol.encode()) % len(self.SECTORS)]
+        return {
+            "shortName": f"{symbol.replace('.NS', '').title()} Ltd",
+            "sector": sector,
+            "trailingPE": round(float(rng.uniform(5, 60)), 2),
+            "priceToBook": round(float(rng.uniform(0.5, 12)), 2),
+            "marketCap": int(rng.uniform(5e9, 2e13)),
+            "beta": round(float(beta), 2),
+            "dividendYield": round(float(rng.uniform(0, 0.04)), 4),
+        }
+
+
+class FaultInjectingSource:
+    """
+    Wrap another source and inject latency, transient errors and HTTP 429s,
+    to exercise the fetch engine's rate limiting and retries locally.
+    """
+
+    def __init__(self, inner, latency: float = 0.0, error_rate: float = 0.0,
+                 throttle_rate: float = 0.0, seed: int = None):
+        self.inner = inner
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = 0
+
+    def _maybe_fail(self):
+        with self.lock:
+            self.calls += 1
+            roll = self.rng.random()
+        if self.latency:
+            time.sleep(self.latency)
+        if roll < self.throttle_rate:
+            raise ThrottledError("429 Too Many Requests (injected)")
+        if roll < self.throttle_rate + self.error_rate:
+            raise ConnectionError("Injected transient error")
+
+    def download(self, symbols, start, end, interval: str = "1d"):
+        self._maybe_fail()
+        return self.inner.download(symbols, start, end, interval=interval)
+
+    def info(self, symbol: str):
+        self._maybe_fail()
+        return self.inner.info(symbol)
@@ -0,0 +1,127 @@
+"""
+Local OHLCV store (SQLite) keyed by (symbol, date).
+
+StockDataCollector reads history from here first and only downloads bars
+newer than the last stored one, so a daily run moves ~1 bar per symbol and
+the store accumulates long history for the analytics at no network cost.
+"""
+import os
+import sqlite3
+import threading
+
+import pandas as pd
+
+DEFAULT_STORE_PATH = os.path.join("cache", "prices.sqlite")
+OHLCV_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+
+
+class PriceStore:
+    def __init__(self, path: str = DEFAULT_STORE_PATH):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # timeout: shard processes may share the file and wait on each other's writes
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=60)
+        self.lock = threading.Lock()
+        with self.lock, self.conn:
+            self.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS bars (
+                    symbol TEXT NOT NULL,
+                    date   TEXT NOT NULL,
+                    open REAL, high REAL, low REAL, close REAL, volume REAL,
+                    PRIMARY KEY (symbol, date)
+                )
+                """
+            )
+            # earliest start any stored download asked for: whatever the
+            # source has before a symbol's first bar is known to be nothing
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS requested (symbol TEXT PRIMARY KEY, since TEXT NOT NULL)"
+            )
+
+    def _dates(self, aggregate: str, symbols):
+        symbols = list(symbols)
+        if not symbols:
+            return {}
+        marks = ",".join("?" * len(symbols))
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT symbol, {aggregate}(date) FROM bars WHERE symbol IN ({marks}) GROUP BY symbol",
+                symbols,
+            ).fetchall()
+        return {sym: pd.Timestamp(d).date() for sym, d in rows}
+
+    def last_dates(self, symbols):
+        """{symbol: date of last stored bar}; symbols with no bars are absent"""
+        return self._dates("MAX", symbols)
+
+    def first_dates(self, symbols):
+        """{symbol: date of first stored bar}; symbols with no bars are absent"""
+        return self._dates("MIN", symbols)
+
+    def requested_since(self, symbols):
+        """{symbol: earliest start a saved download was requested from}"""
+        symbols = list(symbols)
+        if not symbols:
+            return {}
+        marks = ",".join("?" * len(symbols))
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT symbol, since FROM requested WHERE symbol IN ({marks})", symbols
+            ).fetchall()
+        return {sym: pd.Timestamp(d).date() for sym, d in rows}
+
+    def save(self, frames, since=None):
+        """
+        Upsert {symbol: OHLCV DataFrame}; later downloads replace earlier bars.
+        Bars without a close are kept (as NULL), so validation still sees them.
+        `since` is the start the frames were downloaded from.
+        """
+        rows = []
+        for sym, df in frames.items():
+            df = df.reindex(columns=OHLCV_COLUMNS)
+            for ts, o, h, l, c, v in df.itertuples():
+                rows.append((sym, pd.Timestamp(ts).strftime("%Y-%m-%d"), o, h, l, c, v))
+        if not rows:
+            return 0
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO bars VALUES (?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            if since is not None:
+                since = pd.Timestamp(since).strftime("%Y-%m-%d")
+                self.conn.executemany(
+                    "INSERT INTO requested VALUES (?, ?) ON CONFLICT(symbol) "
+                    "DO UPDATE SET since = MIN(since, excluded.since)",
+                    [(sym, since) for sym in frames],
+                )
+        return len(rows)
+
+    def load(self, symbols, start=None):
+        """{symbol: OHLCV DataFrame indexed by date} from `start` onwards"""
+        symbols = list(symbols)
+        if not symbols:
+            return {}
+        marks = ",".join("?" * len(symbols))
+        query = f"SELECT * FROM bars WHERE symbol IN ({marks})"
+        params = list(symbols)
+        if start is not None:
+            query += " AND date >= ?"
+            params.append(pd.Timestamp(start).strftime("%Y-%m-%d"))
+        query += " ORDER BY symbol, date"
+
+        with self.lock:
+            df = pd.read_sql_query(query, self.conn, params=params)
+        if df.empty:
+            return {}
+
+        df["date"] = pd.to_datetime(df["date"])
+        df = df.rename(columns={c.lower(): c for c in OHLCV_COLUMNS})
+        return {
+            sym: grp.drop(columns="symbol").set_index("date").rename_axis("Date")
+            for sym, grp in df.groupby("symbol", sort=False)
+        }
+
+    def close(self):
+        self.conn.close()
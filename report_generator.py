@@ -1,9 +1,42 @@
+"""
+PDF report rendering, entirely in memory.
+
+The report is a list of parts, each starting on a new page:
+    [{"title": "PART 1: ...", "sections": [section, ...]}]
+where a section is either a table ({"title", "columns", "rows", "align"})
+or free text ({"title", "text"}) - see MarketAnalyzer.intraday_sections().
+Tables are real table rows that break across pages with the header row
+repeated; the footer shows the true page count. create_pdf() returns the
+PDF bytes and only touches the disk when asked to archive a copy.
+"""
 from fpdf import FPDF
 from datetime import datetime
 
+# Core PDF fonts are latin-1 only; map the few symbols the analyzer emits
+LATIN1_SUBSTITUTES = str.maketrans({
+    "▲": "+", "▼": "-", "•": "-", "–": "-", "—": "-",
+    "‘": "'", "’": "'", "“": '"', "”": '"', "₹": "Rs", "✅": "",
+})
+
+ALIGN = {"L": "LEFT", "R": "RIGHT", "C": "CENTER"}
+
+
+def latin1(value) -> str:
+    text = str(value)
+    if text.isascii():
+        return text
+    return text.translate(LATIN1_SUBSTITUTES).encode("latin-1", "replace").decode("latin-1")
+
+
+def report_filename(tag: str = None) -> str:
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    return f"stock_report_{tag}_{stamp}.pdf" if tag else f"stock_report_{stamp}.pdf"
+
+
 class StockReportPDF(FPDF):
-    def __init__(self):
+    def __init__(self, subtitle: str = None):
         super().__init__()
+        self.subtitle = subtitle or "Real Data Analysis | Medium-Risk Portfolio"
         self.set_auto_page_break(auto=True, margin=12)
 
     def header(self):
@@ -11,7 +44,7 @@ class StockReportPDF(FPDF):
         self.cell(0, 8, "DAILY INDIAN STOCK MARKET REPORT", 0, 1, "C")
         self.set_font("Helvetica", "", 9)
         self.cell(0, 5, f"Analysis Date: {datetime.now().strftime('%d %B %Y | %H:%M IST')}", 0, 1, "C")
-        self.cell(0, 5, "Real Data Analysis | Medium-Risk Portfolio", 0, 1, "C")
+        self.cell(0, 5, latin1(self.subtitle), 0, 1, "C")
         self.ln(3)
         self.line(10, self.get_y(), 200, self.get_y())
         self.ln(3)
@@ -19,9 +52,10 @@ class StockReportPDF(FPDF):
     def footer(self):
         self.set_y(-12)
         self.set_font("Helvetica", "I", 7)
+        # {nb} is replaced with the final page count when the document is output
         self.cell(
             0, 5,
-            f"Page {self.page_no()}/4 | Auto-generated by Stock Agent | Not Investment Advice",
+            f"Page {self.page_no()}/{{nb}} | Auto-generated by Stock Agent | Not Investment Advice",
             0, 0, "C"
         )
 
@@ -31,37 +65,62 @@ class StockReportPDF(FPDF):
         self.cell(0, 7, title, 0, 1, "L", True)
         self.ln(2)
 
+    def section_title(self, title: str):
+        self.set_font("Helvetica", "B", 9.5)
+        self.cell(0, 6, latin1(title), 0, 1, "L")
+
     def body_text(self, text: str):
         self.set_font("Helvetica", "", 8.5)
-        safe = text.encode("latin-1", "replace").decode("latin-1")
-        self.multi_cell(0, 4, safe)
-
-def create_pdf(intraday_text: str, portfolio_text: str) -> str:
-    """Generate 4-page PDF report with REAL data"""
-    pdf = StockReportPDF()
-
-    intraday_lines = intraday_text.split("\n")
-    portfolio_lines = portfolio_text.split("\n")
-    
-    mid1 = len(intraday_lines) // 2
-    mid2 = len(portfolio_lines) // 2
-
-    pdf.add_page()
-    pdf.chapter_title("PART 1: MARKET OVERVIEW & INDICES")
-    pdf.body_text("\n".join(intraday_lines[:mid1]))
-
-    pdf.add_page()
-    pdf.chapter_title("PART 2: SECTOR ANALYSIS & TRADING STRATEGY")
-    pdf.body_text("\n".join(intraday_lines[mid1:]))
-
-    pdf.add_page()
-    pdf.chapter_title("PART 3: MEDIUM-RISK STOCK RECOMMENDATIONS")
-    pdf.body_text("\n".join(portfolio_lines[:mid2]))
-
-    pdf.add_page()
-    pdf.chapter_title("PART 4: PORTFOLIO ALLOCATION & ENTRY LEVELS")
-    pdf.body_text("\n".join(portfolio_lines[mid2:]))
-
-    filename = f"stock_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-    pdf.output(filename)
-    return filename
+        self.multi_cell(0, 4, latin1(text))
+
+    def data_table(self, columns, rows, align=None):
+        """Rows of cells as a table; long tables continue on the next page"""
+        self.set_font("Helvetica", "", 8)
+        cells = [[latin1(c) for c in columns]] + [[latin1(c) for c in row] for row in rows]
+        # column widths proportional to the widest cell, header included;
+        # no column takes more than 40% of the page, long cells wrap instead
+        widths = [
+            min(max(self.get_string_width(row[i]) for row in cells) + 3, self.epw * 0.4)
+            for i in range(len(columns))
+        ]
+        align = align or "L" * len(columns)
+        with self.table(
+            col_widths=widths,
+            text_align=tuple(ALIGN[a] for a in align),
+            line_height=4.5,
+            width=min(sum(widths), self.epw),
+            align="LEFT",
+            repeat_headings=1,
+            padding=(0.5, 1),
+        ) as table:
+            for row in cells:
+                table.row(row)
+
+
+def render_report(parts, subtitle: str = None) -> bytes:
+    pdf = StockReportPDF(subtitle)
+    for part in parts:
+        pdf.add_page()
+        pdf.chapter_title(part["title"])
+        for section in part["sections"]:
+            if section.get("title"):
+                pdf.section_title(section["title"])
+            if section.get("rows") is not None:
+                pdf.data_table(section["columns"], section["rows"], section.get("align"))
+            else:
+                pdf.body_text(section["text"])
+            pdf.ln(3)
+    return bytes(pdf.output())
+
+
+def create_pdf(intraday, portfolio, path: str = None, subtitle: str = None) -> bytes:
+    """
+    Render the report (the analyzer's structured parts for each half) to PDF
+    bytes. With `path` a copy is also written there, for archiving;
+    `subtitle` replaces the header's default third line (report profiles).
+    """
+    data = render_report(list(intraday) + list(portfolio), subtitle)
+    if path:
+        with open(path, "wb") as f:
+            f.write(data)
+    return data
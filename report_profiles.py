@@ -0,0 +1,146 @@
+"""
+Report profiles: several reports from one data collection.
+
+A profile is a universe subset (the stock_universe.select() filters), the
+portfolio rules (MarketAnalyzer's risk band, picks, stop loss, targets) and
+the Telegram chats it goes to. The run collects the union of every
+profile's symbols once; each profile is then analysed and rendered from
+that shared stock table.
+
+Profiles live in a JSON file (data/profiles.json):
+
+    {"profiles": [
+        {"name": "nifty50", "title": "NIFTY 50", "index": "NIFTY50",
+         "risk_band": [3, 6], "max_picks": 10,
+         "chat_ids": ["$TELEGRAM_CHAT_ID_NIFTY50"]}
+    ]}
+
+Chat IDs are usually environment references ($NAME), so the file can be
+committed without them; references that are not set are dropped. A
+profile can also name its own screen definitions, "screens": "file.json"
+(a JSON list as in screens.py, relative to the profiles file); the others
+use the run's --screens file or screens.DEFAULT_SCREENS.
+"""
+import json
+import os
+
+from stock_universe import select
+
+DEFAULT_PROFILES_FILE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "data", "profiles.json"
+)
+SELECTION_KEYS = ("index", "sector", "max_tier", "symbols")
+RULE_KEYS = ("risk_band", "max_picks", "stop_loss", "targets")
+
+
+class ReportProfile:
+    def __init__(self, name: str, title: str = None, selection=None, rules=None,
+                 chat_ids=(), screens=None):
+        self.name = name
+        self.title = title
+        self.selection = dict(selection or {})
+        self.rules = dict(rules or {})
+        self.chat_ids = list(chat_ids)
+        self.screens = screens
+
+    @classmethod
+    def from_dict(cls, spec, base_dir: str = "."):
+        known = {"name", "title", "chat_ids", "screens", *SELECTION_KEYS, *RULE_KEYS}
+        unknown = set(spec) - known
+        if unknown:
+            raise ValueError(f"Profile {spec.get('name')!r}: unknown key(s) {sorted(unknown)}")
+        if not spec.get("name"):
+            raise ValueError("Every profile needs a name")
+        screens = None
+        if "screens" in spec:
+            from screens import load_screens
+            screens = load_screens(os.path.join(base_dir, spec["screens"]))
+        return cls(
+            spec["name"],
+            title=spec.get("title"),
+            selection={k: spec[k] for k in SELECTION_KEYS if k in spec},
+            rules={k: spec[k] for k in RULE_KEYS if k in spec},
+            chat_ids=spec.get("chat_ids", []),
+            screens=screens,
+        )
+
+    def symbols(self):
+        return select(**self.selection)
+
+    def recipients(self):
+        """Chat IDs with $VARS expanded; unset references are dropped"""
+        chats = []
+        for chat in self.chat_ids:
+            chat = os.path.expandvars(str(chat)).strip()
+            if chat and "$" not in chat and chat not in chats:
+                chats.append(chat)
+        return chats
+
+    def stock_table(self, table):
+        """This profile's rows of the shared stock table"""
+        wanted = {sym.replace(".NS", "") for sym in self.symbols()}
+        return table[table["symbol"].isin(wanted)].reset_index(drop=True)
+
+
+def default_profile(args, screens=None):
+    """The single report of a plain run: the selection flags, TELEGRAM_CHAT_ID"""
+    selection = {k: getattr(args, k) for k in SELECTION_KEYS if getattr(args, k) is not None}
+    return ReportProfile(
+        "default", selection=selection, chat_ids=["$TELEGRAM_CHAT_ID"], screens=screens
+    )
+
+
+def load_profiles(path: str = DEFAULT_PROFILES_FILE, names=None, screens=None):
+    """
+    Profiles from `path`, in file order; `names` picks a subset. `screens`
+    is used by the profiles that do not name their own.
+    """
+    base_dir = os.path.dirname(os.path.abspath(path))
+    with open(path) as f:
+        profiles = [
+            ReportProfile.from_dict(spec, base_dir) for spec in json.load(f)["profiles"]
+        ]
+    for profile in profiles:
+        if profile.screens is None:
+            profile.screens = screens
+    seen = [p.name for p in profiles]
+    duplicates = sorted({n for n in seen if seen.count(n) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate profile name(s) in {path}: {duplicates}")
+    if names:
+        missing = sorted(set(names) - set(seen))
+        if missing:
+            raise ValueError(f"Unknown profile(s) {missing}; {path} has {seen}")
+        profiles = [p for p in profiles if p.name in names]
+    return profiles
+
+
+def union_symbols(profiles):
+    """Every symbol some profile needs, once, in universe order"""
+    wanted = set()
+    for profile in profiles:
+        wanted.update(profile.symbols())
+    return [sym for sym in select() if sym in wanted]
+
+
+def build_report(profile, indices, table, news, pdf_path: str = None,
+                 structure=None) -> bytes:
+    """
+    Analyse and render one profile from the shared data (`structure` is the
+    run's MarketStructure, if any); returns the PDF bytes. Module-level so
+    it can run in a worker process.
+    """
+    from analyzer import MarketAnalyzer
+    from report_generator import create_pdf
+    from screens import DEFAULT_SCREENS
+    from stock_table import sector_performance
+
+    stocks = profile.stock_table(table)
+    analyzer = MarketAnalyzer(**profile.rules)
+    screens = profile.screens if profile.screens is not None else DEFAULT_SCREENS
+    intraday = analyzer.intraday_sections(
+        indices, stocks, news, sector_performance(stocks), screens=screens,
+        structure=structure,
+    )
+    portfolio = analyzer.portfolio_sections(stocks, structure=structure)
+    return create_pdf(intraday, portfolio, path=pdf_path, subtitle=profile.title)
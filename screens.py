@@ -0,0 +1,137 @@
+"""
+Declarative stock screens evaluated over the columnar stock table.
+
+A screen is a plain dict (JSON-friendly, see DEFAULT_SCREENS):
+    name        unique key
+    title       report section heading
+    where       list of [column, op, value] filters, ANDed; op in OPS
+    sectors     optional list of sectors to restrict to
+    rank_by     column to rank by
+    descending  rank high-to-low (default True)
+    top         rows to keep (per sector when per_sector is set)
+    per_sector  take the top rows within every sector
+    show        extra columns printed in the report
+
+ScreenEngine builds one sorted index per ranking column and the sector
+partitions once, so many screens run as boolean masks + top-K walks over
+those indexes instead of repeated full sorts.
+"""
+import json
+
+import numpy as np
+
+OPS = {
+    "<": np.less,
+    "<=": np.less_equal,
+    ">": np.greater,
+    ">=": np.greater_equal,
+    "==": np.equal,
+    "!=": np.not_equal,
+}
+
+# Columns derived from the stock table that screens can filter / rank on
+DERIVED_COLUMNS = {
+    "pct_from_high": lambda t: (t["week52_high"] - t["current_price"]) / t["week52_high"] * 100,
+    "pct_from_low": lambda t: (t["current_price"] - t["week52_low"]) / t["week52_low"] * 100,
+}
+
+DEFAULT_SCREENS = [
+    {
+        "name": "sector_momentum",
+        "title": "SECTOR MOMENTUM LEADERS (Top 2 per sector, 30D)",
+        "rank_by": "month_return",
+        "top": 2,
+        "per_sector": True,
+    },
+    {
+        "name": "near_52w_high",
+        "title": "NEAR 52-WEEK HIGHS (within 3%)",
+        "where": [["pct_from_high", "<=", 3]],
+        "rank_by": "pct_from_high",
+        "descending": False,
+        "top": 10,
+        "show": ["month_return"],
+    },
+    {
+        "name": "low_beta_dividend",
+        "title": "LOW-BETA DIVIDEND PAYERS (beta < 0.8, yield > 1.5%)",
+        "where": [["beta", "<", 0.8], ["dividend_yield", ">", 1.5]],
+        "rank_by": "dividend_yield",
+        "top": 10,
+        "show": ["beta"],
+    },
+    {
+        "name": "quiet_value",
+        "title": "LOW-VOLATILITY VALUE (PE 0-20, volatility < 2%)",
+        "where": [["pe_ratio", ">", 0], ["pe_ratio", "<", 20], ["volatility", "<", 2]],
+        "rank_by": "pe_ratio",
+        "descending": False,
+        "top": 10,
+        "show": ["volatility"],
+    },
+]
+
+
+def load_screens(path: str):
+    """Read a JSON list of screen definitions"""
+    with open(path) as f:
+        return json.load(f)
+
+
+class ScreenEngine:
+    def __init__(self, table):
+        self.table = table.reset_index(drop=True).assign(
+            **{col: fn(table).to_numpy() for col, fn in DERIVED_COLUMNS.items()}
+        )
+        self.sector_codes, self.sector_names = self.table["sector"].factorize()
+        self.sector_rows = {
+            name: np.flatnonzero(self.sector_codes == code)
+            for code, name in enumerate(self.sector_names)
+        }
+        self.orders = {}
+
+    def order(self, column: str, descending: bool = True):
+        """Row positions sorted by `column` (NaN always last); built once per column"""
+        key = (column, descending)
+        if key not in self.orders:
+            values = self.table[column].to_numpy(dtype=float)
+            order = np.argsort(-values if descending else values, kind="stable")
+            self.orders[key] = order
+        return self.orders[key]
+
+    def mask(self, screen):
+        mask = np.ones(len(self.table), dtype=bool)
+        for column, op, value in screen.get("where", []):
+            values = self.table[column].to_numpy(dtype=float)
+            with np.errstate(invalid="ignore"):
+                mask &= OPS[op](values, value)
+        if screen.get("sectors"):
+            in_sectors = np.zeros(len(self.table), dtype=bool)
+            for sector in screen["sectors"]:
+                in_sectors[self.sector_rows.get(sector, [])] = True
+            mask &= in_sectors
+        return mask
+
+    def run(self, screen):
+        """Rows of the stock table passing `screen`, best first"""
+        mask = self.mask(screen)
+        top = screen.get("top", 10)
+        order = self.order(screen["rank_by"], screen.get("descending", True))
+        ranked = order[mask[order]]
+
+        if screen.get("per_sector"):
+            codes = self.sector_codes[ranked]
+            # sector groups ordered by their best member
+            _, first = np.unique(codes, return_index=True)
+            picks = [ranked[codes == codes[i]][:top] for i in sorted(first)]
+            ranked = np.concatenate(picks) if picks else ranked
+        else:
+            ranked = ranked[:top]
+
+        return self.table.iloc[ranked]
+
+    def run_all(self, screens):
+        """{screen name: result rows} for every screen, sharing the indexes"""
+        for screen in screens:
+            self.order(screen["rank_by"], screen.get("descending", True))
+        return {screen["name"]: self.run(screen) for screen in screens}
@@ -0,0 +1,108 @@
+"""
+Sharded universe collection.
+
+The universe is split into N shards of equal size (within one): symbols are
+ranked by a stable hash and dealt out in turn, so the split does not depend
+on the order of the universe list and a symbol stays in its shard (and its
+journal entries) across runs while the universe is unchanged. A plain
+hash-modulo split would keep symbols put as the universe grows, but its
+shards are uneven (25-44 symbols for 133 in 4), and the slowest shard sets
+the wall time. Each shard is collected by its own process or CI matrix job and
+written to a small gzipped JSON file; merge_shards() puts the pieces back
+together in universe order for the report stages.
+"""
+import glob
+import gzip
+import json
+import os
+import zlib
+
+DEFAULT_SHARD_DIR = "shards"
+
+
+def parse_shard(spec: str):
+    """'2/8' -> (2, 8); shard indexes are 0-based"""
+    try:
+        index, count = (int(part) for part in spec.split("/"))
+    except ValueError:
+        raise ValueError(f"Shard must look like i/N, got {spec!r}")
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Shard index out of range: {spec!r}")
+    return index, count
+
+
+def shard_symbols(symbols, index: int, count: int):
+    """Symbols of shard `index` of `count`, in universe order"""
+    ranked = sorted(symbols, key=lambda sym: (zlib.crc32(sym.encode()), sym))
+    mine = set(ranked[index::count])
+    return [sym for sym in symbols if sym in mine]
+
+
+def shard_path(index: int, count: int, directory: str = DEFAULT_SHARD_DIR) -> str:
+    return os.path.join(directory, f"shard_{index}_of_{count}.json.gz")
+
+
+def write_shard(path: str, index: int, count: int, symbols, indices, data, skips=None,
+                closes=None):
+    """
+    Compact intermediate file for one shard's collection result; `closes`
+    is the JSON form of the shard's closes window (market_structure).
+    """
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    payload = {
+        "shard": [index, count],
+        "symbols": list(symbols),
+        "indices": indices,
+        "stocks": data,
+        "skips": skips or {},
+        "closes": closes,
+    }
+    tmp = f"{path}.tmp"
+    with gzip.open(tmp, "wt") as f:
+        json.dump(payload, f, separators=(",", ":"))
+    os.replace(tmp, path)
+    return path
+
+
+def read_shard(path: str):
+    with gzip.open(path, "rt") as f:
+        return json.load(f)
+
+
+def merge_shards(paths, universe=None):
+    """
+    Combine shard files into (indices, stocks_data, skips, closes), closes
+    being each shard's closes window payload. Stocks follow `universe`
+    order when given; raises if shards are missing or from different splits.
+    """
+    shards = [read_shard(p) for p in paths]
+    if not shards:
+        raise FileNotFoundError("No shard files to merge")
+
+    counts = {s["shard"][1] for s in shards}
+    if len(counts) != 1:
+        raise ValueError(f"Shards come from different splits: {sorted(counts)}")
+    count = counts.pop()
+    missing = set(range(count)) - {s["shard"][0] for s in shards}
+    if missing:
+        raise ValueError(f"Missing shard(s) {sorted(missing)} of {count}")
+
+    indices = next((s["indices"] for s in shards if s["indices"]), None)
+    skips = {}
+    by_symbol = {}
+    order = []
+    for s in shards:
+        skips.update(s["skips"])
+        order.extend(s["symbols"])
+        for record in s["stocks"]:
+            by_symbol[record["symbol"]] = record
+
+    position = {sym.replace(".NS", ""): i for i, sym in enumerate(universe or order)}
+    data = sorted(by_symbol.values(), key=lambda r: position.get(r["symbol"], len(position)))
+    closes = [s.get("closes") for s in shards if s.get("closes")]
+    return indices, data, skips, closes
+
+
+def find_shards(directory: str = DEFAULT_SHARD_DIR):
+    return sorted(glob.glob(os.path.join(directory, "shard_*_of_*.json.gz")))
@@ -0,0 +1,44 @@
+"""
+Columnar stock table: the per-stock records from StockDataCollector turned
+into one typed DataFrame, built once per run and shared by every analysis
+stage so filtering, scoring and ranking are vectorized column expressions.
+"""
+import pandas as pd
+
+STOCK_COLUMNS = {
+    "symbol": "object",
+    "name": "object",
+    "sector": "object",
+    "current_price": "float64",
+    "pe_ratio": "float64",
+    "pb_ratio": "float64",
+    "market_cap": "int64",
+    "beta": "float64",
+    "dividend_yield": "float64",
+    "week52_high": "float64",
+    "week52_low": "float64",
+    "month_return": "float64",
+    "volatility": "float64",
+}
+
+
+def build_stock_table(records):
+    """List of stock record dicts -> typed DataFrame (one row per stock)"""
+    df = pd.DataFrame.from_records(list(records), columns=list(STOCK_COLUMNS))
+    return df.astype(STOCK_COLUMNS)
+
+
+def as_stock_table(data):
+    """Accept either a stock table or the raw list of records"""
+    if isinstance(data, pd.DataFrame):
+        return data
+    return build_stock_table(data or [])
+
+
+def sector_performance(data):
+    """{sector: average 30D return}, best sector first"""
+    table = as_stock_table(data)
+    if table.empty:
+        return {}
+    grp = table.groupby("sector")["month_return"].mean().sort_values(ascending=False)
+    return grp.to_dict()
@@ -1,44 +1,113 @@
 """
 VERIFIED ACTIVE NSE STOCKS - Only stocks with 100% reliable Yahoo Finance data
-Tested and confirmed working as of Dec 2024
+
+The universe lives in a versioned data file (data/universe_<version>.csv)
+with one row per symbol: Yahoo symbol, name, sector, index membership
+("|"-separated, e.g. NIFTY50) and a liquidity tier (1 = NIFTY 50,
+2 = NIFTY Next 50 / Midcap 150, 3 = the rest). Index membership is as of
+the file's snapshot (v1: Dec 2024).
+
+Standard library only and nothing happens at import, so tools that just
+need the symbol list start instantly:
+
+    python stock_universe.py --index NIFTY50
+    python stock_universe.py --sector Technology --max-tier 2
 """
+import argparse
+import csv
+import os
+from functools import lru_cache
+
+UNIVERSE_VERSION = "v1"
+UNIVERSE_FILE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "data", f"universe_{UNIVERSE_VERSION}.csv"
+)
+
+
+def _key(name: str) -> str:
+    """'Nifty 50' / 'NIFTY_50' / 'nifty50' all match NIFTY50"""
+    return "".join(ch for ch in name.upper() if ch.isalnum())
+
+
+@lru_cache(maxsize=None)
+def load_universe(path: str = UNIVERSE_FILE):
+    """{symbol: metadata} in file order"""
+    universe = {}
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            universe[row["symbol"]] = {
+                "symbol": row["symbol"],
+                "name": row["name"],
+                "sector": row["sector"],
+                "indices": [i for i in row["indices"].split("|") if i],
+                "liquidity_tier": int(row["liquidity_tier"]),
+            }
+    return universe
+
+
+def select(index: str = None, sector: str = None, max_tier: int = None,
+           symbols=None, path: str = UNIVERSE_FILE):
+    """
+    Universe symbols matching every given filter, in file order. `symbols`
+    may be given with or without the .NS suffix.
+    """
+    wanted = None
+    if symbols:
+        wanted = {s if s.endswith(".NS") or s.startswith("^") else f"{s}.NS" for s in symbols}
+    selected = []
+    for sym, meta in load_universe(path).items():
+        if index and _key(index) not in {_key(i) for i in meta["indices"]}:
+            continue
+        if sector and _key(sector) != _key(meta["sector"]):
+            continue
+        if max_tier is not None and meta["liquidity_tier"] > max_tier:
+            continue
+        if wanted is not None and sym not in wanted:
+            continue
+        selected.append(sym)
+    return selected
+
+
+def metadata(symbol: str, path: str = UNIVERSE_FILE):
+    """Universe row for `symbol`, {} when it is not in the file"""
+    return load_universe(path).get(symbol, {})
+
+
+def sectors(path: str = UNIVERSE_FILE):
+    return sorted({meta["sector"] for meta in load_universe(path).values()})
+
+
+def add_selection_args(parser):
+    """--index / --sector / --max-tier / --symbols for scripts that take a subset"""
+    parser.add_argument("--index", help="only symbols in this index, e.g. NIFTY50")
+    parser.add_argument("--sector", help="only symbols in this sector")
+    parser.add_argument("--max-tier", type=int, help="only liquidity tiers up to this")
+    parser.add_argument("--symbols", nargs="+", help="explicit symbols (.NS optional)")
+
+
+def select_from_args(args):
+    return select(
+        index=args.index, sector=args.sector, max_tier=args.max_tier, symbols=args.symbols
+    )
+
+
+def __getattr__(name):
+    # Old list names, built on first access instead of at import
+    if name == "STOCK_UNIVERSE":
+        return select()
+    if name == "NIFTY_50_VERIFIED":
+        return select(index="NIFTY50")
+    if name == "QUALITY_STOCKS":
+        return [s for s in select() if "NIFTY50" not in metadata(s)["indices"]]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
-# NIFTY 50 - Most liquid, always available on Yahoo
-NIFTY_50_VERIFIED = [
-    'RELIANCE.NS', 'TCS.NS', 'HDFCBANK.NS', 'INFY.NS', 'ICICIBANK.NS',
-    'HINDUNILVR.NS', 'SBIN.NS', 'BHARTIARTL.NS', 'KOTAKBANK.NS', 'ITC.NS',
-    'LT.NS', 'AXISBANK.NS', 'ASIANPAINT.NS', 'MARUTI.NS', 'SUNPHARMA.NS',
-    'TITAN.NS', 'ULTRACEMCO.NS', 'NESTLEIND.NS', 'WIPRO.NS', 'HCLTECH.NS',
-    'BAJFINANCE.NS', 'POWERGRID.NS', 'NTPC.NS', 'TATASTEEL.NS', 'ONGC.NS',
-    'JSWSTEEL.NS', 'M&M.NS', 'TATAMOTORS.NS', 'ADANIENT.NS', 'ADANIPORTS.NS',
-    'COALINDIA.NS', 'BAJAJFINSV.NS', 'GRASIM.NS', 'TECHM.NS', 'INDUSINDBK.NS',
-    'HINDALCO.NS', 'DRREDDY.NS', 'DIVISLAB.NS', 'CIPLA.NS', 'BRITANNIA.NS',
-    'EICHERMOT.NS', 'APOLLOHOSP.NS', 'HEROMOTOCO.NS', 'BPCL.NS', 'TATACONSUM.NS',
-    'SBILIFE.NS', 'HDFCLIFE.NS', 'BAJAJ-AUTO.NS', 'SHRIRAMFIN.NS', 'LTIM.NS'
-]
-
-# Additional quality stocks (tested working)
-QUALITY_STOCKS = [
-    'ADANIGREEN.NS', 'AMBUJACEM.NS', 'BANKBARODA.NS', 'COLPAL.NS', 'DLF.NS',
-    'DABUR.NS', 'GAIL.NS', 'GODREJCP.NS', 'HAVELLS.NS', 'ICICIPRULI.NS',
-    'INDIGO.NS', 'IOC.NS', 'JINDALSTEL.NS', 'JUBLFOOD.NS', 'LUPIN.NS',
-    'MARICO.NS', 'MOTHERSON.NS', 'NAUKRI.NS', 'NMDC.NS', 'PNB.NS',
-    'RECLTD.NS', 'SBICARD.NS', 'SIEMENS.NS', 'SRF.NS', 'TATAPOWER.NS',
-    'TORNTPHARM.NS', 'TRENT.NS', 'VEDL.NS', 'VBL.NS', 'ZOMATO.NS',
-    'ZYDUSLIFE.NS', 'ACC.NS', 'ASHOKLEY.NS', 'AUBANK.NS', 'BATAINDIA.NS',
-    'BHARATFORG.NS', 'BIOCON.NS', 'CROMPTON.NS', 'CUMMINSIND.NS', 'DEEPAKNTR.NS',
-    'DIXON.NS', 'ESCORTS.NS', 'EXIDEIND.NS', 'FEDERALBNK.NS', 'FORTIS.NS',
-    'GLAND.NS', 'GODREJPROP.NS', 'IDFCFIRSTB.NS', 'INDIANB.NS', 'INDUSTOWER.NS',
-    'IRFC.NS', 'JSWENERGY.NS', 'KAJARIACER.NS', 'LICHSGFIN.NS', 'LTTS.NS',
-    'M&MFIN.NS', 'MAXHEALTH.NS', 'MCX.NS', 'MGL.NS', 'MPHASIS.NS',
-    'NAVINFLUOR.NS', 'NATIONALUM.NS', 'OBEROIRLTY.NS', 'PERSISTENT.NS', 'PETRONET.NS',
-    'PFC.NS', 'POLYCAB.NS', 'POONAWALLA.NS', 'PRESTIGE.NS', 'PVRINOX.NS',
-    'RBLBANK.NS', 'SHREECEM.NS', 'SJVN.NS', 'STARHEALTH.NS', 'SUNDRMFAST.NS',
-    'SUPREMEIND.NS', 'TATACHEM.NS', 'TATACOMM.NS', 'TORNTPOWER.NS', 'TVSMOTOR.NS',
-    'UNIONBANK.NS', 'UPL.NS', 'VOLTAS.NS'
-]
-
-# Combined verified stock universe (150+ stocks)
-STOCK_UNIVERSE = sorted(list(set(NIFTY_50_VERIFIED + QUALITY_STOCKS)))
-
-print(f"Stock Universe: {len(STOCK_UNIVERSE)} verified active stocks")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="List (a subset of) the stock universe")
+    add_selection_args(parser)
+    args = parser.parse_args()
+    symbols = select_from_args(args)
+    for sym in symbols:
+        meta = metadata(sym)
+        print(f"{sym:16} {meta['sector']:24} T{meta['liquidity_tier']} {meta['name']}")
+    print(f"{len(symbols)} symbols ({UNIVERSE_VERSION})")
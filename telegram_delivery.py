@@ -0,0 +1,206 @@
+"""
+Telegram delivery off the pipeline's critical path.
+
+TelegramDelivery keeps one pooled HTTP session (a single TLS handshake per
+run) and a queue drained by a background thread, so send_message() and
+send_document() return immediately and the data stages never wait on the
+network. Messages go out in the order they were queued. One bot serves
+several chats: every send can name its chat, the default is chat_id.
+
+Failed sends are retried with exponential backoff and jitter; a 429 waits
+for Telegram's `retry_after` instead. Other 4xx answers (bad token, chat
+not found) are not retried. close() flushes the queue with a timeout at
+shutdown - whatever is still pending after that is dropped and reported.
+
+The API base is configurable (TELEGRAM_API_BASE), so delivery can be
+exercised against a local stub server.
+"""
+import os
+import queue
+import random
+import threading
+import time
+
+from metrics import METRICS
+
+DEFAULT_API_BASE = "https://api.telegram.org"
+
+
+class TelegramError(Exception):
+    def __init__(self, message: str, retry_after: float = None, retryable: bool = True):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.retryable = retryable
+
+
+class TelegramDelivery:
+    def __init__(self, token: str = None, chat_id: str = None, api_base: str = None,
+                 max_retries: int = 4, base_delay: float = 1.0, max_delay: float = 30.0,
+                 timeout: float = 30.0):
+        self.token = token
+        self.chat_id = chat_id
+        self.api_base = (api_base or DEFAULT_API_BASE).rstrip("/")
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.enabled = bool(token)
+        self.queue = queue.Queue()
+        self.stopping = threading.Event()
+        self.worker = None
+        self.session = None
+        self.lock = threading.Lock()
+        self.stats = {"sent": 0, "retries": 0, "failed": 0, "dropped": 0}
+        if not self.enabled:
+            print("Telegram credentials missing - notifications disabled")
+
+    @classmethod
+    def from_env(cls, **kwargs):
+        return cls(
+            token=os.getenv("TELEGRAM_BOT_TOKEN"),
+            chat_id=os.getenv("TELEGRAM_CHAT_ID"),
+            api_base=os.getenv("TELEGRAM_API_BASE"),
+            **kwargs,
+        )
+
+    def _start(self):
+        with self.lock:
+            if self.worker is not None:
+                return
+            self.worker = threading.Thread(target=self._drain, daemon=True)
+            self.worker.start()
+
+    def _enqueue(self, method: str, data, files=None):
+        if not self.enabled:
+            return
+        if not data["chat_id"]:
+            print(f"Telegram {method}: no chat id, not sent")
+            return
+        if self.stopping.is_set():
+            print(f"Telegram {method} after close, not sent")
+            return
+        self._start()
+        self.queue.put((method, data, files, time.monotonic()))
+
+    def send_message(self, text: str, chat_id: str = None):
+        self._enqueue("sendMessage", {"chat_id": chat_id or self.chat_id, "text": text})
+
+    def send_document(self, data: bytes, filename: str, caption: str = None,
+                      mime: str = "application/pdf", chat_id: str = None):
+        fields = {"chat_id": chat_id or self.chat_id}
+        if caption:
+            fields["caption"] = caption
+        self._enqueue("sendDocument", fields, {"document": (filename, data, mime)})
+
+    def backoff(self, attempt: int) -> float:
+        delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def _post(self, method: str, data, files=None):
+        url = f"{self.api_base}/bot{self.token}/{method}"
+        try:
+            r = self.session.post(url, data=data, files=files, timeout=self.timeout)
+        except Exception as e:
+            raise TelegramError(f"{type(e).__name__}: {e}")
+        if r.status_code == 200:
+            return
+        try:
+            body = r.json()
+        except ValueError:
+            body = {}
+        description = body.get("description") or r.reason
+        if r.status_code == 429:
+            retry_after = (body.get("parameters") or {}).get("retry_after")
+            if retry_after is None:
+                retry_after = r.headers.get("Retry-After")
+            raise TelegramError(
+                f"429 {description}",
+                retry_after=float(retry_after) if retry_after is not None else None,
+            )
+        raise TelegramError(f"{r.status_code} {description}", retryable=r.status_code >= 500)
+
+    def _send(self, method: str, data, files=None):
+        """One queued item, with retries; False once it is given up"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                with METRICS.timer("telegram.send_s"):
+                    self._post(method, data, files)
+                self.stats["sent"] += 1
+                return True
+            except TelegramError as e:
+                if not e.retryable or attempt == self.max_retries:
+                    print(f"Telegram {method} failed: {e}")
+                    self.stats["failed"] += 1
+                    return False
+                delay = e.retry_after if e.retry_after is not None else self.backoff(attempt)
+                print(f"Telegram {method}: {e}, retrying in {delay:.1f}s")
+                self.stats["retries"] += 1
+                # a close() that has run out of time interrupts the wait
+                if self.stopping.wait(delay):
+                    self.stats["dropped"] += 1
+                    return False
+
+    def _connect(self):
+        # imported here, on the worker: requests is only needed once something is sent
+        import requests
+        from requests.adapters import HTTPAdapter
+        self.session = requests.Session()
+        # retries are ours (they honour retry_after), not urllib3's
+        self.session.mount(self.api_base, HTTPAdapter(pool_maxsize=2, max_retries=0))
+
+    def _drain(self):
+        self._connect()
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    self.session.close()
+                    return
+                method, data, files, queued = item
+                if self.stopping.is_set():
+                    self.stats["dropped"] += 1
+                    continue
+                METRICS.observe("telegram.queue_s", time.monotonic() - queued)
+                self._send(method, data, files)
+            finally:
+                self.queue.task_done()
+
+    def flush(self, timeout: float = None) -> bool:
+        """Wait until everything queued so far is sent or given up"""
+        if self.worker is None:
+            return True
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self.queue.all_tasks_done:
+            while self.queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.queue.all_tasks_done.wait(remaining)
+        return True
+
+    def _drop_queued(self) -> int:
+        dropped = 0
+        while True:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                return dropped
+            self.stats["dropped"] += 1
+            dropped += 1
+            self.queue.task_done()
+
+    def close(self, timeout: float = 60.0) -> bool:
+        """Flush with a timeout, then stop the worker; True if nothing was lost"""
+        flushed = self.flush(timeout)
+        self.stopping.set()
+        if self.worker is not None:
+            if not flushed:
+                # drop what is left rather than block shutdown on it
+                print(f"Telegram: gave up on {self._drop_queued()} queued "
+                      f"item(s) after {timeout:.0f}s")
+            self.queue.put(None)
+            # a request still in flight is not waited for; the thread is a daemon
+            self.worker.join(timeout=1)
+        for key in ("sent", "retries", "failed", "dropped"):
+            METRICS.incr(f"telegram.{key}", self.stats[key])
+        return flushed and not self.stats["failed"] and not self.stats["dropped"]